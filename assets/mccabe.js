@@ -0,0 +1,277 @@
+// Clientside McCabe-Thiele plot for the /mccabe page.
+// Slider drags are handled entirely in the browser from the equilibrium curve in curve-store, which holds the
+// knots x, y and slopes d of a monotone PCHIP spline (mccabe.MonotoneCurve.to_dict on the server). This mirrors
+// mccabe.py: the same spline evaluation, exact inverse, feed intersection and stage stepping.
+
+(function() {
+    function hermite(t, h, y0, y1, d0, d1) {
+        var t2 = t*t, t3 = t2*t;
+        return (2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*h*d0 + (-2*t3 + 3*t2)*y1 + (t3 - t2)*h*d1;
+    }
+
+    function hermiteDt(t, h, y0, y1, d0, d1) {
+        var t2 = t*t;
+        return (6*t2 - 6*t)*(y0 - y1) + (3*t2 - 4*t + 1)*h*d0 + (3*t2 - 2*t)*h*d1;
+    }
+
+    // index i of the interval [knots[i], knots[i + 1]] holding v, like bisect_right - 1 clipped to the ends
+    function interval(knots, v) {
+        var lo = 0, hi = knots.length;
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (knots[mid] <= v) { lo = mid + 1; } else { hi = mid; }
+        }
+        return Math.min(Math.max(lo - 1, 0), knots.length - 2);
+    }
+
+    function evaluate(curve, x) {
+        x = Math.min(Math.max(x, 0), 1);
+        var i = interval(curve.x, x), h = curve.x[i + 1] - curve.x[i];
+        return hermite((x - curve.x[i])/h, h, curve.y[i], curve.y[i + 1], curve.d[i], curve.d[i + 1]);
+    }
+
+    // x on the equilibrium curve for a vapor composition y; Newton with a bisection fallback on one cubic
+    function inverse(curve, y) {
+        var ys = curve.y, n = ys.length;
+        y = Math.min(Math.max(y, ys[0]), ys[n - 1]);
+        var i = interval(ys, y), h = curve.x[i + 1] - curve.x[i];
+        var y0 = ys[i], y1 = ys[i + 1], d0 = curve.d[i], d1 = curve.d[i + 1];
+        var lo = 0, hi = 1, t = y1 !== y0 ? Math.min(Math.max((y - y0)/(y1 - y0), 0), 1) : 0.5;
+        for (var k = 0; k < 30; k++) {
+            var f = hermite(t, h, y0, y1, d0, d1) - y;
+            if (Math.abs(f) <= 1e-14) { break; }
+            if (f < 0) { lo = t; } else { hi = t; }
+            var slope = hermiteDt(t, h, y0, y1, d0, d1);
+            var tNew = slope !== 0 ? t - f/slope : lo;
+            t = (tNew > lo && tNew < hi) ? tNew : 0.5*(lo + hi);
+        }
+        return curve.x[i] + t*h;
+    }
+
+    // q-line / rectifying-line intersection, closed form (q = 1 needs no special case)
+    function feedIntersection(xd, xf, q, R) {
+        var x = (q + R === 0) ? xd : (xd*(q - 1) + xf*(R + 1))/(q + R);
+        return [x, R/(R + 1)*x + xd/(R + 1)];
+    }
+
+    function stepStages(curve, xd, xb, xf, q, R, maxStages) {
+        maxStages = maxStages || 200;
+        var sol = feedIntersection(xd, xf, q, R), xsol = sol[0], ysol = sol[1];
+        var rectSlope = R/(R + 1), rectIntercept = xd/(R + 1);
+        var stripSlope = xsol !== xb ? (ysol - xb)/(xsol - xb) : 0;
+        var steps = {x: [], y: [], xEq: [], yEnd: [], feedstage: 1, pinch: false, xsol: xsol, ysol: ysol};
+        var x = xd, y = xd;
+        while (x > xb && steps.x.length < maxStages) {
+            var xEq = inverse(curve, y), yNext;
+            if (xEq >= x) { steps.pinch = true; break; }
+            steps.x.push(x); steps.y.push(y); steps.xEq.push(xEq);
+            if (xEq > xsol) {
+                yNext = rectSlope*xEq + rectIntercept;
+                steps.yEnd.push(yNext);
+                steps.feedstage += 1;
+            } else {
+                yNext = stripSlope*(xEq - xb) + xb;
+                steps.yEnd.push(Math.max(yNext, xEq)); // drawn no lower than the diagonal
+            }
+            x = xEq; y = yNext;
+        }
+        steps.stages = steps.x.length;
+        return steps;
+    }
+
+    // the curve sampled on a fixed grid, computed once per curve-store value
+    var denseCache = new WeakMap();
+    function dense(curve) {
+        var cached = denseCache.get(curve);
+        if (!cached) {
+            var xs = linspace(0, 1, 1001);
+            cached = [xs, xs.map(function(x) { return evaluate(curve, x); })];
+            denseCache.set(curve, cached);
+        }
+        return cached;
+    }
+
+    // R_min from the feed pinch, the rectifying tangent and the stripping tangent, as mccabe.minimum_reflux
+    function minimumReflux(curve, xd, xb, xf, q) {
+        var d = dense(curve), x = d[0], y = d[1], n = x.length, i;
+        for (i = 0; i < n; i++) {
+            if (x[i] > xb && x[i] < xd && y[i] <= x[i]) {
+                return {R_min: Infinity, x_pinch: x[i], y_pinch: x[i], pinch: 'azeotrope'};
+            }
+        }
+        var xq = null;
+        var g = x.map(function(xi, k) { return (q - 1)*y[k] - q*xi + xf; });
+        for (i = 0; i < n - 1; i++) {
+            if (Math.sign(g[i]) !== Math.sign(g[i + 1])) {
+                var root = x[i] - g[i]*(x[i + 1] - x[i])/(g[i + 1] - g[i]);
+                if (xq === null || Math.abs(root - xf) < Math.abs(xq - xf)) { xq = root; }
+            }
+        }
+        if (xq === null || !(xb < xq && xq < xd)) { return null; }
+        var yq = evaluate(curve, xq);
+        var best = {slope: (xd - yq)/(xd - xq), x: xq, y: yq, pinch: 'feed'};
+        var stripMin = Infinity, stripAt = -1;
+        for (i = 0; i < n; i++) {
+            if (x[i] > xq && x[i] < xd) {
+                var chord = (xd - y[i])/(xd - x[i]);
+                if (chord > best.slope) { best = {slope: chord, x: x[i], y: y[i], pinch: 'rectifying tangent'}; }
+            } else if (x[i] > xb && x[i] < xq) {
+                var stripChord = (y[i] - xb)/(x[i] - xb);
+                if (stripChord < stripMin) { stripMin = stripChord; stripAt = i; }
+            }
+        }
+        if (stripAt >= 0 && stripMin < (yq - xb)/(xq - xb)) {
+            var denominator = (q - 1)*stripMin - q;
+            if (denominator !== 0) {
+                var xs = (-xf - (q - 1)*xb*(1 - stripMin))/denominator, ys = xb + stripMin*(xs - xb);
+                var stripSlope = (xd - ys)/(xd - xs);
+                if (stripSlope > best.slope) { best = {slope: stripSlope, x: x[stripAt], y: y[stripAt], pinch: 'stripping tangent'}; }
+            }
+        }
+        return {R_min: best.slope < 1 ? Math.max(best.slope/(1 - best.slope), 0) : Infinity, x_pinch: best.x, y_pinch: best.y, pinch: best.pinch};
+    }
+
+    // total reflux stepping with a fractional last stage, plus the Fenske estimate, as mccabe.minimum_stages
+    function minimumStages(curve, xd, xb) {
+        if (!(0 < xb && xb < xd && xd < 1)) { return null; }
+        var x = xd, stages = 0, fraction = 0;
+        while (x > xb && stages < 200) {
+            var xEq = inverse(curve, x);
+            if (xEq >= x) { return {N_min: Infinity, fenske: Infinity}; }
+            stages += 1;
+            fraction = xEq < xb ? (x - xb)/(x - xEq) : 1;
+            x = xEq;
+        }
+        var yd = evaluate(curve, xd), yb = evaluate(curve, xb);
+        var alpha = Math.sqrt(yd*(1 - xd)/(xd*(1 - yd))*yb*(1 - xb)/(xb*(1 - yb)));
+        var fenske = alpha > 1 ? Math.log(xd/(1 - xd)*(1 - xb)/xb)/Math.log(alpha) : Infinity;
+        return {N_min: stages - 1 + fraction, fenske: fenske};
+    }
+
+    function minimumText(xd, xb, xf, q, R, curve) {
+        if (!curve) { return [window.dash_clientside.no_update, window.dash_clientside.no_update]; }
+        var reflux = minimumReflux(curve, xd, xb, xf, q), stages = minimumStages(curve, xd, xb), rText, nText;
+        if (reflux === null) {
+            rText = 'Minimum reflux ratio: no pinch, the feed line does not meet the curve between xb and xd';
+        } else if (!isFinite(reflux.R_min)) {
+            rText = 'Minimum reflux ratio: unbounded (' + reflux.pinch + ' at x = ' + reflux.x_pinch.toFixed(3) + ')';
+        } else {
+            rText = 'Minimum reflux ratio: ' + reflux.R_min.toFixed(3) + ' (' + reflux.pinch + ' pinch at x = '
+                + reflux.x_pinch.toFixed(3) + '), R/R_min = ' + (reflux.R_min > 0 ? (R/reflux.R_min).toFixed(2) : '\u221e');
+        }
+        if (stages === null) {
+            nText = 'Minimum stages (total reflux): n/a';
+        } else if (!isFinite(stages.N_min)) {
+            nText = 'Minimum stages (total reflux): unbounded';
+        } else {
+            nText = 'Minimum stages (total reflux): ' + stages.N_min.toFixed(2) + ' (Fenske ' + stages.fenske.toFixed(2) + ')';
+        }
+        return [rText, nText];
+    }
+
+    function linspace(a, b, n) {
+        var out = new Array(n);
+        for (var i = 0; i < n; i++) { out[i] = a + (b - a)*i/(n - 1); }
+        return out;
+    }
+
+    // the whole staircase as one trace, two endpoints per segment and a null separator (a gap in plotly)
+    function staircase(steps) {
+        var xs = [], ys = [];
+        for (var i = 0; i < steps.stages; i++) {
+            xs.push(steps.x[i], steps.xEq[i], null, steps.xEq[i], steps.xEq[i], null);
+            ys.push(steps.y[i], steps.y[i], null, steps.y[i], steps.yEnd[i], null);
+        }
+        return [xs, ys];
+    }
+
+    function updatePlot(xd, xb, xf, q, R, curve, comp1, comp2, T, P, figure) {
+        var nc = window.dash_clientside.no_update;
+        if (!curve) { return [nc, nc, nc]; }
+        var xplot = linspace(0, 1, 201);
+        var data = [
+            {name: 'Equilibrium Line', x: xplot, y: xplot.map(function(x) { return evaluate(curve, x); }), mode: 'lines', line: {color: 'yellow'}},
+            {name: 'y=x Line', x: [0, 1], y: [0, 1], mode: 'lines', line: {color: 'white'}}
+        ];
+        var stages = 0, feedstage = 1;
+        if (q !== null && q !== undefined && R !== null && R !== undefined) {
+            var steps = stepStages(curve, xd, xb, xf, q, R);
+            // straight lines only need their endpoints
+            data.push(
+                {name: 'Rectifying Section', x: [xd, steps.xsol], y: [xd, steps.ysol], mode: 'lines', line: {color: 'orange'}},
+                {name: 'Feed Section', x: [xf, steps.xsol], y: [xf, steps.ysol], mode: 'lines', line: {color: 'red'}},
+                {name: 'Stripping Section', x: [xb, steps.xsol], y: [xb, steps.ysol], mode: 'lines', line: {color: 'green'}}
+            );
+            stages = steps.stages;
+            feedstage = steps.feedstage;
+            var stairs = staircase(steps);
+            data.push({name: 'staircase', x: stairs[0], y: stairs[1], mode: 'lines', line: {color: 'white'}, showlegend: false});
+        }
+        data.push(
+            {name: 'Rectifying Dot', x: [xd], y: [xd], mode: 'markers', marker: {color: 'orange', size: 10}, showlegend: false},
+            {name: 'Stripping Dot', x: [xb], y: [xb], mode: 'markers', marker: {color: 'green', size: 10}, showlegend: false},
+            {name: 'Feed Dot', x: [xf], y: [xf], mode: 'markers', marker: {color: 'red', size: 10}, showlegend: false}
+        );
+
+        var figtitle = (T !== null && T !== undefined)
+            ? 'McCabe-Thiele Method for ' + comp1 + ' + ' + comp2 + ' at ' + T + ' K'
+            : 'McCabe-Thiele Method for ' + comp1 + ' + ' + comp2 + ' at ' + P + ' Pa';
+        var layout = Object.assign({}, (figure || {}).layout, {
+            title: {text: figtitle, x: 0.5, xanchor: 'center', font: {color: 'white', family: 'Merriweather Sans'}},
+            legend: {x: 0.75, y: 0.1, xanchor: 'left', yanchor: 'bottom', font: {color: 'white', family: 'Merriweather Sans'}},
+            margin: {l: 10, r: 10, t: 40, b: 10},
+            plot_bgcolor: '#08306b',
+            paper_bgcolor: '#08306b'
+        });
+        return [{data: data, layout: layout}, 'Number of stages: ' + stages, 'Feed stage: ' + feedstage];
+    }
+
+    function sub(index) {
+        return {namespace: 'dash_html_components', type: 'Sub', props: {children: index}};
+    }
+
+    function span(children) {
+        return {namespace: 'dash_html_components', type: 'Span', props: {children: children}};
+    }
+
+    function sliderValues(xd, xb, xf, q, R) {
+        return [
+            span(['x', sub('d'), ' = ' + xd.toFixed(2)]),
+            span(['x', sub('b'), ' = ' + xb.toFixed(2)]),
+            span(['x', sub('f'), ' = ' + xf.toFixed(2)]),
+            'q = ' + q.toFixed(1),
+            'R = ' + R.toFixed(1)
+        ];
+    }
+
+    // keeps xb < xf < xd, nudging whichever slider was just moved
+    function enforceConstraints(xd, xf, xb) {
+        var triggered = window.dash_clientside.callback_context.triggered;
+        if (!triggered || !triggered.length) { return [xd, xf, xb]; }
+        var id = triggered[0].prop_id.split('.')[0];
+        if (id === 'xd-slider') {
+            if (xd < xf) { xd = xf + 0.01; }
+        } else if (id === 'xf-slider') {
+            if (xf > xd) { xf = xd - 0.01; }
+            if (xf < xb) { xf = xb + 0.01; }
+        } else if (id === 'xb-slider') {
+            if (xb > xf) { xb = xf - 0.01; }
+        }
+        return [xd, xf, xb];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        mccabe: {
+            update_plot: updatePlot,
+            slider_values: sliderValues,
+            enforce_constraints: enforceConstraints,
+            minimum_text: minimumText,
+            // exposed for the other McCabe callbacks and for checking against mccabe.py
+            evaluate: evaluate,
+            inverse: inverse,
+            step_stages: stepStages,
+            minimum_reflux: minimumReflux,
+            minimum_stages: minimumStages
+        }
+    });
+})();
@@ -0,0 +1,70 @@
+# Benchmark: Kinetics ODE right-hand side, string-parsing closure vs the compiled ReactionNetwork
+# legacy_rhs is the previous odes(t, y) from pages/3_Kinetics.py (species stripped so spaced input parses), which
+# re-split and regex-matched every reaction on each call. Both are timed per evaluation and over a full RK45 solve.
+# Run from the repository root: python -m benchmarks.kinetics_rhs
+import re
+import time
+import numpy as np
+from scipy.integrate import solve_ivp
+from reactionnetwork import ReactionNetwork
+
+networks = {
+    'A -> B': (['A -> B'], [1.0]),
+    'combustion': (['2H2 + O2 -> 2H2O'], [0.5]),
+    'series/parallel': (['A + B -> C', 'C -> D', 'A + D -> E', 'E -> 2B'], [1.0, 0.5, 0.2, 0.1]),
+    'chain of 12': ([f'X{i} -> X{i + 1}' for i in range(12)] + ['X12 + X0 -> 2X6'], list(np.linspace(0.5, 2, 13))),
+}
+evaluations = 20000
+repeats = 5
+
+def legacy_rhs(reactions, ks, ordered_species):
+    def odes(t, y):
+        dydt = np.zeros(len(ordered_species))
+        concentrations = {species: y[i] for i, species in enumerate(ordered_species)}
+        for i, reaction in enumerate(reactions):
+            reactants, products = reaction.split('->')
+            reactant_species = []
+            for species in reactants.split('+'):
+                coeff, sp = re.match(r'(\d*)(\w+)', species.strip()).groups()
+                coeff = int(coeff) if coeff else 1
+                reactant_species.append((sp, coeff))
+            rate = ks[i] * np.prod([concentrations[sp]**coeff for sp, coeff in reactant_species])
+            for sp, coeff in reactant_species:
+                dydt[ordered_species.index(sp)] -= rate * coeff
+            for product in products.split('+'):
+                coeff, sp = re.match(r'(\d*)(\w+)', product.strip()).groups()
+                coeff = int(coeff) if coeff else 1
+                dydt[ordered_species.index(sp)] += rate * coeff
+        return dydt
+    return odes
+
+def per_call(f, y, number = evaluations):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            f(0.0, y)
+        times.append(time.perf_counter() - start)
+    return min(times)/number*1e6
+
+def solve_time(f, y0):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        solution = solve_ivp(f, (0, 10), y0, t_eval=np.linspace(0, 10, 1000), method='RK45')
+        times.append(time.perf_counter() - start)
+    return min(times)*1e3, solution
+
+if __name__ == '__main__':
+    print(f"{'network':<18}{'species':>8}{'legacy (us)':>13}{'compiled (us)':>15}{'speedup':>9}"
+          f"{'solve legacy (ms)':>19}{'compiled (ms)':>15}{'max |dC|':>11}")
+    for name, (reactions, ks) in networks.items():
+        network = ReactionNetwork.from_reactions(reactions)
+        legacy, compiled = legacy_rhs(reactions, ks, network.species), network.rhs(ks)
+        y0 = np.random.default_rng(0).uniform(0.5, 1.5, len(network.species))
+        assert np.allclose(legacy(0.0, y0), compiled(0.0, y0), rtol=1e-12, atol=0)
+        t_legacy, t_compiled = per_call(legacy, y0), per_call(compiled, y0)
+        s_legacy, reference = solve_time(legacy, y0)
+        s_compiled, solution = solve_time(compiled, y0)
+        print(f"{name:<18}{len(network.species):>8}{t_legacy:>13.1f}{t_compiled:>15.1f}{t_legacy/t_compiled:>8.1f}x"
+              f"{s_legacy:>19.1f}{s_compiled:>15.1f}{np.max(np.abs(reference.y - solution.y)):>11.1e}")
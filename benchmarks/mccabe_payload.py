@@ -0,0 +1,54 @@
+# Benchmark: JSON size of the McCabe-Thiele traces produced per slider event
+# Compares the previous encoding (every operating line and stage segment as a 100 point linspace, the staircase
+# split over three traces) with the compact one (line endpoints, one staircase trace with None separators).
+# Run from the repository root: python -m benchmarks.mccabe_payload
+import itertools
+import numpy as np
+from plotly.io.json import to_json_plotly
+from TxyPxyxy import xy_data
+from mccabe import MonotoneCurve, step_stages, staircase
+
+pairs = [('methanol', 'water', {'T': 300}), ('acetone', 'chloroform', {'T': 300}), ('ethanol', 'water', {'P': 1.01325})]
+sliders = list(itertools.product([0.8, 0.9, 0.95], [0.05, 0.1], [0.4, 0.5], [0.0, 0.5, 1.0, 1.5], [1, 2, 5])) # xd, xb, xf, q, R
+
+def legacy_traces(steps, xd, xb, xf, pts = 100):
+    xsol, ysol = steps['xsol'], steps['ysol']
+    traces = []
+    for x0 in (xd, xf, xb):
+        x = np.linspace(x0, xsol, pts)
+        with np.errstate(invalid='ignore'): # q = 1 puts xsol on xf, the old code produced NaNs there too
+            traces.append({'x': x, 'y': (ysol - x0)*(x - x0)/(xsol - x0) + x0})
+    rect = steps['x_eq'] > xsol
+    traces.append({'x': np.linspace(steps['x'], steps['x_eq'], pts, axis=1).ravel(), 'y': np.repeat(steps['y'], pts)})
+    for part in (rect, ~rect):
+        traces.append({'x': np.repeat(steps['x_eq'][part], pts),
+                       'y': np.linspace(steps['y'][part], steps['y_end'][part], pts, axis=1).ravel()})
+    return traces
+
+def compact_traces(steps, xd, xb, xf):
+    xsol, ysol = steps['xsol'], steps['ysol']
+    traces = [{'x': [x0, xsol], 'y': [x0, ysol]} for x0 in (xd, xf, xb)]
+    xs, ys = staircase(steps)
+    traces.append({'x': xs, 'y': ys})
+    return traces
+
+def size(traces):
+    return len(to_json_plotly(traces))
+
+if __name__ == '__main__':
+    print(f"{'pair':<24}{'events':>7}{'mean stages':>13}{'previous (B)':>14}{'compact (B)':>13}{'reduction':>11}")
+    totals = [0, 0]
+    for comp1, comp2, condition in pairs:
+        curve = MonotoneCurve.from_points(*xy_data(comp1, comp2, **condition))
+        legacy, compact, stages = [], [], []
+        for xd, xb, xf, q, R in sliders:
+            steps = step_stages(curve, xd, xb, xf, q, R)
+            stages.append(steps['stages'])
+            legacy.append(size(legacy_traces(steps, xd, xb, xf)))
+            compact.append(size(compact_traces(steps, xd, xb, xf)))
+        totals[0] += sum(legacy)
+        totals[1] += sum(compact)
+        print(f"{comp1 + '/' + comp2:<24}{len(sliders):>7}{np.mean(stages):>13.1f}{np.mean(legacy):>14.0f}"
+              f"{np.mean(compact):>13.0f}{np.mean(legacy)/np.mean(compact):>10.0f}x")
+    print(f"{'all':<24}{len(sliders)*len(pairs):>7}{'':>13}{totals[0]/len(sliders)/len(pairs):>14.0f}"
+          f"{totals[1]/len(sliders)/len(pairs):>13.0f}{totals[0]/totals[1]:>10.0f}x")
@@ -0,0 +1,179 @@
+# VLE benchmark suite with a stored baseline, to catch slowdowns from code changes or thermo upgrades
+# Run from the repository root:
+#   python -m benchmarks.vle                        # run, write benchmarks/vle_results.json, compare to the baseline
+#   python -m benchmarks.vle --update-baseline      # run and overwrite benchmarks/vle_baseline.json
+#   python -m benchmarks.vle --threshold 0.5 --case-threshold from_IDs=1.0
+# Exits with status 1 when a case is slower than its baseline by more than the threshold (0.3 = +30%).
+# Every timed repeat is paired with a calibration workload timed right next to it, and the median of the
+# per-repeat ratios is the case's normalized time. A case is a regression only when both that normalized time
+# and the raw median are slower than the baseline by more than the threshold: a throttled or shared CPU (or a
+# different machine) moves the raw time but not the ratio, and a swing in the calibration alone moves the ratio
+# but not the raw time.
+# Fully offline: chemical data comes from the installed chemicals/thermo databases, and the disk cache and
+# prebuilt library point at a temporary directory so results never depend on, or touch, the repo caches.
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='vlebench-')
+os.environ['VLE_CACHE_DIR'] = os.path.join(_scratch, 'cache')
+os.environ['VLE_LIBRARY'] = os.path.join(_scratch, 'library')
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import chemicals
+import thermo
+from thermo import ChemicalConstantsPackage
+from TxyPxyxy import build_flasher, get_flasher, xy_curve, cached_curve, xy
+from vlecache import VLECache, cache_key
+from vlelibrary import VLELibrary, build_library
+
+here = os.path.dirname(os.path.abspath(__file__))
+default_results = os.path.join(here, 'vle_results.json')
+default_baseline = os.path.join(here, 'vle_baseline.json')
+
+pairs = [('methanol', 'water'), ('acetone', 'chloroform'), ('benzene', 'toluene')]
+T = 300 # K
+pts_values = [11, 25, 50, 100]
+repeats = 5
+
+def _timed(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start)*1e3/number
+
+def _calibration_workload():
+    # a mix of interpreter and small-numpy work, roughly what a flash loop does
+    total = 0.0
+    for i in range(2000):
+        total += np.sqrt(np.float64(i))*1.5
+    return np.sort(np.random.default_rng(0).random(20000)).sum() + total
+
+def measure(function, repeats = repeats, min_repeat_ms = 20):
+    # the first call is timed on its own (cold caches), then the loop count per repeat is raised until one
+    # repeat takes at least min_repeat_ms so microsecond cases are not lost in timer noise; times are per call
+    first = _timed(function, 1)
+    number = 1
+    while _timed(function, number)*number < min_repeat_ms and number < 1e6:
+        number *= 10
+    times, ratios, calibration = [], [], []
+    for _ in range(repeats):
+        before = _timed(_calibration_workload, 1)
+        times.append(_timed(function, number))
+        after = _timed(_calibration_workload, 1)
+        calibration.append(0.5*(before + after))
+        ratios.append(times[-1]/calibration[-1])
+    return {'best_ms': min(times), 'median_ms': statistics.median(times), 'first_ms': first,
+            'calibration_ms': statistics.median(calibration), 'relative': statistics.median(ratios),
+            'number': number, 'repeats': repeats}
+
+def plot_xy(comp1, comp2):
+    # full wrapper path including rendering, the curve itself comes from the cache after the first repeat
+    xy(comp1, comp2, T=T, show=True)
+    plt.gcf().canvas.draw()
+    plt.close('all')
+
+def run(repeats = repeats):
+    results = {}
+    for comp1, comp2 in pairs:
+        pair = f'{comp1}/{comp2}'
+        results[f'from_IDs/{pair}'] = measure(lambda: ChemicalConstantsPackage.from_IDs([comp1, comp2]), repeats)
+        results[f'flasher/{pair}'] = measure(lambda: build_flasher(comp1, comp2), repeats)
+        flasher = get_flasher(comp1, comp2)
+        for pts in pts_values:
+            results[f'xy_curve/{pair}/pts={pts}'] = measure(lambda: xy_curve(flasher, T=T, pts=pts), repeats)
+        results[f'plot_xy/{pair}'] = measure(lambda: plot_xy(comp1, comp2), repeats)
+
+        # cache hit paths: in-memory flasher LRU, on-disk curve cache, memory-mapped prebuilt library
+        results[f'cache/memory/{pair}'] = measure(lambda: get_flasher(comp1, comp2), repeats)
+        key = cache_key('xy', comp1, comp2, T=T, pts=100, salt=thermo.__version__)
+        curve = cached_curve('xy', comp1, comp2, T=T, pts=100)
+        disk = VLECache(os.path.join(_scratch, 'disk'))
+        disk.store(key, **curve)
+        results[f'cache/disk/{pair}'] = measure(lambda: disk.get_or_compute(key, lambda: curve), repeats)
+    library_path = os.path.join(_scratch, 'bench_library')
+    build_library({'pairs': [list(pair) for pair in pairs], 'xy': {'T': [T]}, 'pts': 100, 'model': 'UNIFAC'},
+                  path=library_path)
+    for comp1, comp2 in pairs:
+        key = cache_key('xy', comp1, comp2, T=T, pts=100, salt=thermo.__version__)
+        library = VLELibrary(library_path)
+        results[f'cache/library/{comp1}/{comp2}'] = measure(lambda: library.get(key)['y1'].sum(), repeats)
+    return results
+
+def environment():
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'thermo': thermo.__version__,
+            'chemicals': chemicals.__version__, 'cpu_count': os.cpu_count()}
+
+def compare(results, baseline, threshold = 0.3, case_thresholds = None):
+    # case_thresholds maps a case prefix (e.g. 'from_IDs' or 'cache/disk') to its own threshold
+    case_thresholds = case_thresholds or {}
+    rows, regressions = [], []
+    for case, result in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            rows.append((case, result['median_ms'], None, None, None, 'new'))
+            continue
+        limit = threshold
+        for prefix, value in case_thresholds.items():
+            if case.startswith(prefix):
+                limit = value
+        ratio = result['relative']/reference['relative']
+        raw = result['median_ms']/reference['median_ms']
+        status = 'REGRESSION' if ratio > 1 + limit and raw > 1 + limit else 'ok'
+        if status == 'REGRESSION':
+            regressions.append(case)
+        rows.append((case, result['median_ms'], reference['median_ms'], ratio, raw, status))
+    return rows, regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='VLE benchmarks compared against a stored baseline')
+    parser.add_argument('--out', default=default_results, help='JSON file for this run')
+    parser.add_argument('--baseline', default=default_baseline, help='baseline JSON to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.3, help='allowed fractional slowdown against the baseline')
+    parser.add_argument('--case-threshold', action='append', default=[], metavar='PREFIX=VALUE',
+                        help='threshold for cases starting with PREFIX, may be repeated')
+    parser.add_argument('--repeats', type=int, default=repeats, help='timed repeats per case')
+    args = parser.parse_args()
+
+    try:
+        results = run(args.repeats)
+    finally:
+        shutil.rmtree(_scratch, ignore_errors=True)
+    report = {'environment': environment(), 'results': results}
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f'wrote baseline {args.baseline} ({len(results)} cases)')
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f'no baseline at {args.baseline}, run with --update-baseline first')
+        sys.exit(0)
+    if baseline['environment'] != report['environment']:
+        print('note: baseline was recorded on', baseline['environment'])
+    case_thresholds = {prefix: float(value) for prefix, value in (item.split('=', 1) for item in args.case_threshold)}
+    rows, regressions = compare(results, baseline['results'], args.threshold, case_thresholds)
+    print(f"{'case':<44}{'median (ms)':>13}{'baseline':>11}{'ratio':>8}{'raw':>7}  status")
+    for case, median, reference, ratio, raw, status in rows:
+        reference = '' if reference is None else f'{reference:.4f}'
+        ratio = '' if ratio is None else f'{ratio:.2f}'
+        raw = '' if raw is None else f'{raw:.2f}'
+        print(f'{case:<44}{median:>13.4f}{reference:>11}{ratio:>8}{raw:>7}  {status}')
+    if regressions:
+        print(f'{len(regressions)} regression(s)')
+        sys.exit(1)
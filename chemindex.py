@@ -0,0 +1,165 @@
+# Local chemical-name index: instant validation, "did you mean" suggestions and autocomplete for component inputs
+# thermo resolves names through the chemicals pubchem databases, and a miss on the small default database
+# autoloads the ~850k name main database before failing, so a typo costs seconds before any flash work starts.
+# The index is built once from those databases and pickled (the Dockerfile does this at image build time):
+#   python chemindex.py
+# - names from the default database, sorted, for prefix autocomplete (bisect) and a trigram index for suggestions
+# - every name from both databases as a sorted array of 64-bit hashes, for exact membership without the strings
+import bisect
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import numpy as np
+import chemicals
+from chemicals.identifiers import get_pubchem_db
+
+default_path = os.environ.get('CHEM_INDEX', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chem_index.pkl'))
+
+# identifiers thermo accepts besides names; these are left for thermo to check
+_passthrough = re.compile(r'^(\d{2,7}-\d{2}-\d|inchi=.*|inchikey=.*|pubchem=.*|smiles=.*)$', re.IGNORECASE)
+
+def normalize(name):
+    return ' '.join(name.strip().lower().split())
+
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'little')
+
+def trigrams(name):
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ChemicalIndex:
+    def __init__(self, names, hashes, version = ''):
+        self.names = sorted(set(names))
+        self.hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        self.version = version
+        ids = {}
+        for i, name in enumerate(self.names):
+            for gram in trigrams(name):
+                ids.setdefault(gram, []).append(i)
+        self.grams = {gram: np.array(members, dtype=np.int32) for gram, members in ids.items()}
+        self.gram_counts = np.array([len(trigrams(name)) for name in self.names], dtype=np.int32)
+
+    @classmethod
+    def build(cls, main_db = True):
+        db = get_pubchem_db()
+        names = list(db.name_index)
+        if main_db:
+            db.autoload_main_db()
+        hashes = np.fromiter((name_hash(name) for name in db.name_index), dtype=np.uint64, count=len(db.name_index))
+        return cls(names, hashes, version=chemicals.__version__)
+
+    def __contains__(self, name):
+        key = np.uint64(name_hash(normalize(name)))
+        i = np.searchsorted(self.hashes, key)
+        return bool(i < len(self.hashes) and self.hashes[i] == key)
+
+    def complete(self, prefix, limit = 10):
+        # shortest names first, so 'meth' offers methanol before methyl 2-(4-chlorophenoxy)propanoate
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.names, prefix)
+        stop = bisect.bisect_left(self.names, prefix + '\uffff')
+        matches = self.names[start:min(stop, start + 2000)]
+        return sorted(matches, key=lambda name: (len(name), name))[:limit]
+
+    def suggest(self, name, limit = 5, cutoff = 0.3):
+        # Dice similarity on character trigrams, counted for all candidates at once with bincount
+        query = trigrams(normalize(name))
+        members = [self.grams[gram] for gram in query if gram in self.grams]
+        if not members:
+            return []
+        shared = np.bincount(np.concatenate(members), minlength=len(self.names))
+        candidates = np.flatnonzero(shared)
+        scores = 2*shared[candidates]/(len(query) + self.gram_counts[candidates])
+        keep = scores >= cutoff
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return [self.names[i] for i in candidates[best]]
+
+    def validate(self, name):
+        # (ok, suggestions); CAS numbers and InChI/SMILES/PubChem identifiers pass through to thermo
+        if not normalize(name):
+            return False, []
+        if _passthrough.match(name.strip()) or name in self:
+            return True, []
+        return False, self.suggest(name)
+
+def save_index(index, path = default_path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def load_index(path = default_path):
+    # rebuilds (and tries to save) when the file is missing or was built against another chemicals release
+    try:
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if isinstance(index, ChemicalIndex) and index.version == chemicals.__version__:
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    index = ChemicalIndex.build()
+    try:
+        save_index(index, path)
+    except OSError:
+        pass
+    return index
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_index()
+    return _index
+
+def preload():
+    # Loads (or, with no pickle, builds) the index in a daemon thread, once, so a page can warm it up on its
+    # first visit without holding up app startup or a request; see is_loaded
+    global _preload
+    with _preload_lock:
+        if _preload is None:
+            _preload = threading.Thread(target=get_index, name='chemindex-preload', daemon=True)
+            _preload.start()
+
+def is_loaded():
+    return _index is not None
+
+_preload = None
+_preload_lock = threading.Lock()
+
+def validate_name(name):
+    return get_index().validate(name)
+
+def complete_name(prefix, limit = 10):
+    return get_index().complete(prefix, limit)
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Build the local chemical-name index')
+    parser.add_argument('--out', default=default_path, help='output pickle path')
+    parser.add_argument('--default-db-only', action='store_true', help='skip the large main database for membership')
+    args = parser.parse_args()
+    # go through the importable module so the pickle refers to chemindex.ChemicalIndex, not __main__
+    from chemindex import ChemicalIndex, save_index
+    start = time.perf_counter()
+    index = ChemicalIndex.build(main_db=not args.default_db_only)
+    save_index(index, args.out)
+    print(f'indexed {len(index.names)} names ({len(index.hashes)} hashed) in {time.perf_counter() - start:.1f} s, '
+          f'{os.path.getsize(args.out)/1024**2:.1f} MB at {args.out}')
@@ -0,0 +1,295 @@
+# McCabe-Thiele stage stepping on a monotone equilibrium curve
+# The xy curve is made monotone and represented as a PCHIP (monotone piecewise cubic Hermite) spline, so it keeps
+# the shape of the data without the wiggles of a high degree polyfit, and its inverse (y -> x on the equilibrium
+# curve) is exact: every stage is one interval lookup plus a safeguarded Newton solve on one cubic.
+import bisect
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+def equilibrium_table(xi, yi):
+    # Sorted by x with y made non-decreasing, and pinned to (0, 0) and (1, 1). Flat stretches from noise in the
+    # flashes get a tiny slope so y is strictly increasing and the inverse is single valued.
+    x, y = np.asarray(xi, dtype=float), np.asarray(yi, dtype=float)
+    order = np.argsort(x, kind='stable')
+    x, y = np.clip(x[order], 0.0, 1.0), np.clip(y[order], 0.0, 1.0)
+    if x[0] > 0.0:
+        x, y = np.concatenate(([0.0], x)), np.concatenate(([0.0], y))
+    if x[-1] < 1.0:
+        x, y = np.concatenate((x, [1.0])), np.concatenate((y, [1.0]))
+    y = np.maximum.accumulate(y) + np.arange(len(y))*1e-12
+    return x, y
+
+class MonotoneCurve:
+    # PCHIP through a reduced set of knots; x, y and the knot slopes d are all that is stored, which is what
+    # goes into the page's dcc.Store (see to_dict) and what the clientside code evaluates
+    def __init__(self, x, y, d):
+        self.x, self.y, self.d = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(d, dtype=float)
+        self._x, self._y, self._d = self.x.tolist(), self.y.tolist(), self.d.tolist() # for the scalar stage loop
+
+    @classmethod
+    def from_points(cls, xi, yi, tol = 1e-4, max_knots = 60):
+        # Knots are added greedily where the spline through the current knots misses the data the most,
+        # until every data point is within tol
+        x, y = equilibrium_table(xi, yi)
+        knots = sorted({0, len(x)//2, len(x) - 1})
+        while len(knots) < min(max_knots, len(x)):
+            error = np.abs(PchipInterpolator(x[knots], y[knots])(x) - y)
+            worst = int(np.argmax(error))
+            if error[worst] <= tol:
+                break
+            bisect.insort(knots, worst)
+        spline = PchipInterpolator(x[knots], y[knots])
+        return cls(x[knots], y[knots], spline.derivative()(x[knots]))
+
+    def dense(self, pts = 1001):
+        # the curve sampled on a fixed grid, reused by the pinch and sweep geometry
+        if getattr(self, '_dense', None) is None or len(self._dense[0]) != pts:
+            x = np.linspace(0.0, 1.0, pts)
+            self._dense = (x, self(x))
+        return self._dense
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['x'], data['y'], data['d'])
+
+    def to_dict(self):
+        return {'x': self._x, 'y': self._y, 'd': self._d}
+
+    def _interval(self, x):
+        i = np.clip(np.searchsorted(self.x, x, side='right') - 1, 0, len(self.x) - 2)
+        return i, self.x[i + 1] - self.x[i]
+
+    def __call__(self, x):
+        x = np.clip(np.asarray(x, dtype=float), 0.0, 1.0)
+        i, h = self._interval(x)
+        t = (x - self.x[i])/h
+        return _hermite(t, h, self.y[i], self.y[i + 1], self.d[i], self.d[i + 1])
+
+    def inverse(self, y):
+        # x on the curve for each y; the cubic on one interval is monotone so the solve is bracketed in [0, 1]
+        y = np.clip(np.asarray(y, dtype=float), self.y[0], self.y[-1])
+        i = np.clip(np.searchsorted(self.y, y, side='right') - 1, 0, len(self.y) - 2)
+        h = self.x[i + 1] - self.x[i]
+        t = _solve_hermite(y, h, self.y[i], self.y[i + 1], self.d[i], self.d[i + 1])
+        return self.x[i] + t*h
+
+    def inverse_scalar(self, y):
+        # same as inverse for one value in plain floats, the stage loop calls this once per stage
+        xs, ys, ds = self._x, self._y, self._d
+        y = min(max(y, ys[0]), ys[-1])
+        i = min(max(bisect.bisect_right(ys, y) - 1, 0), len(ys) - 2)
+        h = xs[i + 1] - xs[i]
+        return xs[i] + _solve_hermite_scalar(y, h, ys[i], ys[i + 1], ds[i], ds[i + 1])*h
+
+def _hermite(t, h, y0, y1, d0, d1):
+    t2 = t*t
+    t3 = t2*t
+    return (2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*h*d0 + (-2*t3 + 3*t2)*y1 + (t3 - t2)*h*d1
+
+def _hermite_dt(t, h, y0, y1, d0, d1):
+    t2 = t*t
+    return (6*t2 - 6*t)*(y0 - y1) + (3*t2 - 4*t + 1)*h*d0 + (3*t2 - 2*t)*h*d1
+
+def _solve_hermite(target, h, y0, y1, d0, d1, iterations = 30, tol = 1e-14):
+    # Newton from the linear guess, falling back to bisection whenever a step leaves the bracket; elementwise
+    lo, hi = np.zeros_like(target, dtype=float), np.ones_like(target, dtype=float)
+    span = y1 - y0
+    t = np.clip(np.divide(target - y0, span, out=np.full_like(lo, 0.5), where=span != 0), 0.0, 1.0)
+    for _ in range(iterations):
+        f = _hermite(t, h, y0, y1, d0, d1) - target
+        if np.all(np.abs(f) <= tol):
+            break
+        lo, hi = np.where(f < 0, t, lo), np.where(f > 0, t, hi)
+        slope = _hermite_dt(t, h, y0, y1, d0, d1)
+        step = np.divide(f, slope, out=np.full_like(t, np.inf), where=slope != 0)
+        t_new = t - step
+        t = np.where((t_new > lo) & (t_new < hi), t_new, 0.5*(lo + hi))
+    return t
+
+def _solve_hermite_scalar(target, h, y0, y1, d0, d1, iterations = 30, tol = 1e-14):
+    lo, hi = 0.0, 1.0
+    t = min(max((target - y0)/(y1 - y0), 0.0), 1.0) if y1 != y0 else 0.5
+    for _ in range(iterations):
+        f = _hermite(t, h, y0, y1, d0, d1) - target
+        if abs(f) <= tol:
+            break
+        if f < 0:
+            lo = t
+        else:
+            hi = t
+        slope = _hermite_dt(t, h, y0, y1, d0, d1)
+        t_new = t - f/slope if slope != 0 else lo
+        t = t_new if lo < t_new < hi else 0.5*(lo + hi)
+    return t
+
+def feed_intersection(xd, xf, q, R):
+    # Where the q-line meets the rectifying line. Closed form of
+    # q/(q-1) x - xf/(q-1) = R/(R+1) x + xd/(R+1), multiplied through by (q-1)(R+1), so q = 1 needs no special case
+    if q + R == 0: # parallel lines, the feed is taken at the distillate
+        x = xd
+    else:
+        x = (xd*(q - 1) + xf*(R + 1))/(q + R)
+    return x, R/(R + 1)*x + xd/(R + 1)
+
+def minimum_reflux(curve, xd, xb, xf, q, pts = 1001):
+    # R_min from pinch geometry on the sampled curve, no solver. Three pinches are checked:
+    #   feed pinch: the q-line meets the equilibrium curve
+    #   rectifying tangent: steepest chord from (xd, xd) to the curve over [x_q, xd)
+    #   stripping tangent: flattest chord from (xb, xb) over (xb, x_q], carried to the q-line
+    # Returns None when the q-line never meets the curve or the feed is not between xb and xd, and an infinite
+    # R_min when the curve crosses the diagonal between xb and xd (an azeotrope in the way).
+    x, y = curve.dense(pts)
+    inside = (x > xb) & (x < xd)
+    below = inside & (y <= x)
+    if below.any():
+        x_az = float(x[np.argmax(below)])
+        return {'R_min': np.inf, 'x_pinch': x_az, 'y_pinch': x_az, 'pinch': 'azeotrope', 'x_q': None, 'y_q': None}
+    g = (q - 1)*y - q*x + xf # zero on the q-line, multiplied through by (q - 1) so q = 1 is the vertical x = xf
+    crossings = np.flatnonzero(np.sign(g[:-1]) != np.sign(g[1:]))
+    if len(crossings) == 0:
+        return None
+    roots = x[crossings] - g[crossings]*(x[crossings + 1] - x[crossings])/(g[crossings + 1] - g[crossings])
+    x_q = roots[np.argmin(np.abs(roots - xf))]
+    y_q = float(curve(x_q))
+    if not xb < x_q < xd:
+        return None
+
+    rect = (x > x_q) & (x < xd)
+    chord = (xd - y[rect])/(xd - x[rect])
+    slope, x_p, y_p, pinch = (xd - y_q)/(xd - x_q), x_q, y_q, 'feed'
+    if len(chord) and chord.max() > slope:
+        i = np.argmax(chord)
+        slope, x_p, y_p, pinch = chord[i], x[rect][i], y[rect][i], 'rectifying tangent'
+
+    strip = (x > xb) & (x < x_q)
+    strip_chord = (y[strip] - xb)/(x[strip] - xb)
+    if len(strip_chord) and strip_chord.min() < (y_q - xb)/(x_q - xb):
+        # the flattest stripping line that touches the curve, then where it meets the q-line
+        m = strip_chord.min()
+        denominator = (q - 1)*m - q
+        if denominator != 0:
+            x_s = (-xf - (q - 1)*xb*(1 - m))/denominator
+            y_s = xb + m*(x_s - xb)
+            strip_slope = (xd - y_s)/(xd - x_s)
+            if strip_slope > slope:
+                i = np.argmin(strip_chord)
+                slope, x_p, y_p, pinch = strip_slope, x[strip][i], y[strip][i], 'stripping tangent'
+
+    # a pinch slope below zero (y_q above xd) means no reflux is needed, not a negative one
+    R_min = max(slope/(1 - slope), 0.0) if slope < 1 else np.inf
+    return {'R_min': float(R_min), 'x_pinch': float(x_p), 'y_pinch': float(y_p), 'pinch': pinch,
+            'x_q': float(x_q), 'y_q': y_q}
+
+def minimum_stages(curve, xd, xb, max_stages = 200):
+    # Total reflux: steps between the curve and the diagonal, with the last stage counted fractionally,
+    # and the Fenske estimate from the geometric mean relative volatility at the two ends. None unless
+    # 0 < xb < xd < 1, where neither the stepping nor Fenske has an answer.
+    if not 0 < xb < xd < 1:
+        return None
+    x, stages, fraction = xd, 0, 0.0
+    while x > xb and stages < max_stages:
+        x_eq = curve.inverse_scalar(x)
+        if x_eq >= x: # pinch against the diagonal (azeotrope), no finite minimum
+            return {'N_min': np.inf, 'stages': stages, 'fenske': np.inf, 'alpha': 1.0}
+        stages += 1
+        fraction = (x - xb)/(x - x_eq) if x_eq < xb else 1.0
+        x = x_eq
+    ends = np.array([xd, xb])
+    y_ends = curve(ends)
+    alpha = float(np.sqrt(np.prod(y_ends*(1 - ends)/(ends*(1 - y_ends)))))
+    fenske = np.log(xd/(1 - xd)*(1 - xb)/xb)/np.log(alpha) if alpha > 1 else np.inf
+    return {'N_min': stages - 1 + fraction, 'stages': stages, 'fenske': float(fenske), 'alpha': alpha}
+
+def step_stages(curve, xd, xb, xf, q, R, max_stages = 200):
+    # Steps from the distillate down to xb. Returns the corner arrays of the staircase:
+    # horizontal segments run (x[i], y[i]) -> (x_eq[i], y[i]) and vertical ones (x_eq[i], y[i]) -> (x_eq[i], y_end[i]),
+    # along with the stage count, the feed stage and whether stepping stopped at a pinch.
+    xsol, ysol = feed_intersection(xd, xf, q, R)
+    rect_slope, rect_intercept = R/(R + 1), xd/(R + 1)
+    strip_slope = (ysol - xb)/(xsol - xb) if xsol != xb else 0.0
+    xs, ys, x_eqs, y_ends = [], [], [], []
+    x = y = xd
+    feedstage = 1
+    pinch = False
+    while x > xb and len(xs) < max_stages:
+        x_eq = curve.inverse_scalar(y)
+        if x_eq >= x:
+            pinch = True # equilibrium curve at or below the operating line, no further separation
+            break
+        xs.append(x)
+        ys.append(y)
+        x_eqs.append(x_eq)
+        if x_eq > xsol:
+            y_next = rect_slope*x_eq + rect_intercept
+            y_ends.append(y_next)
+            feedstage += 1
+        else:
+            y_next = strip_slope*(x_eq - xb) + xb
+            y_ends.append(max(y_next, x_eq)) # drawn no lower than the diagonal
+        x, y = x_eq, y_next
+    return {'x': np.array(xs), 'y': np.array(ys), 'x_eq': np.array(x_eqs), 'y_end': np.array(y_ends),
+            'stages': len(xs), 'feedstage': feedstage, 'pinch': pinch, 'xsol': xsol, 'ysol': ysol}
+
+def step_stages_batch(curve, xd, xb, xf, q, R, max_stages = 200):
+    # step_stages for a whole grid of designs at once: the arguments broadcast against each other, and every
+    # iteration advances all columns that are still stepping with one vectorized inverse evaluation.
+    # Returns stage and feed stage counts shaped like the broadcast inputs; pinched designs are flagged, and
+    # so are designs that would need more than max_stages (capped).
+    xd, xb, xf, q, R = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (xd, xb, xf, q, R)))
+    shape = xd.shape
+    xd, xb, xf, q, R = (value.ravel() for value in (xd, xb, xf, q, R))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xsol = np.where(q + R == 0, xd, (xd*(q - 1) + xf*(R + 1))/(q + R))
+        ysol = R/(R + 1)*xsol + xd/(R + 1)
+        strip_slope = np.where(xsol != xb, (ysol - xb)/(xsol - xb), 0.0)
+    rect_slope, rect_intercept = R/(R + 1), xd/(R + 1)
+
+    x, y = xd.copy(), xd.copy()
+    stages = np.zeros(len(xd), dtype=int)
+    feedstage = np.ones(len(xd), dtype=int)
+    pinch = np.zeros(len(xd), dtype=bool)
+    active = x > xb
+    for _ in range(max_stages):
+        index = np.flatnonzero(active)
+        if len(index) == 0:
+            break
+        x_eq = curve.inverse(y[index])
+        pinched = x_eq >= x[index]
+        pinch[index[pinched]] = True
+        active[index[pinched]] = False
+        index, x_eq = index[~pinched], x_eq[~pinched]
+        stages[index] += 1
+        rect = x_eq > xsol[index]
+        feedstage[index[rect]] += 1
+        y[index] = np.where(rect, rect_slope[index]*x_eq + rect_intercept[index],
+                            strip_slope[index]*(x_eq - xb[index]) + xb[index])
+        x[index] = x_eq
+        active[index] = x_eq > xb[index]
+    return {'stages': stages.reshape(shape), 'feedstage': feedstage.reshape(shape), 'pinch': pinch.reshape(shape),
+            'capped': active.reshape(shape)}
+
+sweep_modes = {
+    # mode: (x axis name, x grid, y axis name, y grid), the grids span the page's slider ranges
+    'Rq': ('R', np.round(np.linspace(0.0, 10.0, 101), 2), 'q', np.round(np.linspace(-2.0, 2.0, 41), 2)),
+    'xdxb': ('xd', np.round(np.linspace(0.01, 0.99, 99), 2), 'xb', np.round(np.linspace(0.01, 0.99, 99), 2)),
+}
+
+def design_sweep(curve, mode, xd, xb, xf, q, R, max_stages = 100):
+    # Stage and feed stage counts over one of sweep_modes, the other design variables held at the given values.
+    # Designs that pinch, need more than max_stages, or do not satisfy xb < xf < xd are NaN.
+    x_name, x_grid, y_name, y_grid = sweep_modes[mode]
+    X, Y = np.meshgrid(x_grid, y_grid)
+    design = {'xd': xd, 'xb': xb, 'xf': xf, 'q': q, 'R': R, x_name: X, y_name: Y}
+    result = step_stages_batch(curve, design['xd'], design['xb'], design['xf'], design['q'], design['R'], max_stages)
+    valid = ~result['pinch'] & ~result['capped'] & (design['xb'] < xf) & (xf < design['xd'])
+    return {'x_name': x_name, 'x': x_grid, 'y_name': y_name, 'y': y_grid,
+            'stages': np.where(valid, result['stages'], np.nan), 'feedstage': np.where(valid, result['feedstage'], np.nan)}
+
+def staircase(steps):
+    # The whole staircase as one trace: each horizontal and vertical segment is its two endpoints followed by
+    # a None separator, which plotly draws as a gap
+    xs, ys = [], []
+    for x, y, x_eq, y_end in zip(steps['x'].tolist(), steps['y'].tolist(), steps['x_eq'].tolist(), steps['y_end'].tolist()):
+        xs += [x, x_eq, None, x_eq, x_eq, None]
+        ys += [y, y, None, y, y_end, None]
+    return xs, ys
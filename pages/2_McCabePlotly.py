@@ -2,13 +2,16 @@
 import numpy as np
 import plotly.graph_objects as go
 import dash
-from scipy.optimize import fsolve
-from dash import dcc, html, Input, Output, callback, Patch, State, callback_context
-from TxyPxyxy import xy
+import json
+import threading
+from functools import lru_cache
+from dash import dcc, html, Input, Output, State, callback, clientside_callback, ClientsideFunction
+import chemindex
+from mccabe import MonotoneCurve, step_stages, staircase, minimum_reflux, minimum_stages, design_sweep, sweep_modes
 
 dash.register_page(__name__, path='/mccabe', name="McCabe-Thiele")
 
-fig = go.Figure()
+# default pair, condition and design shown on the first visit
 comp1 = "methanol"
 comp2 = "water"
 T = 300
@@ -19,266 +22,231 @@ xf = 0.5
 q = 0.5
 R = 2
 
-if q is not None and R is not None:
-    if q == 1:
-        feedslope = 1e10
+def minimum_text(xd, xb, xf, q, R, curve):
+    # same wording as minimumText in assets/mccabe.js, which keeps these up to date while sliding
+    reflux, minstages = minimum_reflux(curve, xd, xb, xf, q), minimum_stages(curve, xd, xb)
+    if reflux is None:
+        rtext = 'Minimum reflux ratio: no pinch, the feed line does not meet the curve between xb and xd'
+    elif np.isinf(reflux['R_min']):
+        rtext = f"Minimum reflux ratio: unbounded ({reflux['pinch']} at x = {reflux['x_pinch']:.3f})"
     else:
-        feedslope = q/(q-1)
-
-    if R == -1:
-        rectifyslope = 1e10
-    else:
-        rectifyslope = R/(R + 1)
-
-xi, yi = xy(comp1, comp2, T=T, values=True, show=False) # this function lags the app, do not use in the slider callbacks
-z = np.polyfit(xi, yi, 20)
-p = np.poly1d(z)
-
-fig.add_trace(go.Scatter(x=xi, y=p(xi), mode='lines', name='Equilibrium Line', line=dict(color='yellow'), uid='equilibrium'))
-fig.add_trace(go.Scatter(x=xi, y=xi, mode='lines', name='y=x Line', line=dict(color='white'), uid='yx'))
-
-if q is not None and R is not None:
-    def rectifying(xval):
-        return R/(R+1)*xval + xd/(R+1)
-    def feed(xval):
-        return q/(q-1)*xval - xf/(q-1)
-    def feedrectintersection(xval):
-        return q/(q-1)*xval - xf/(q-1) - R/(R+1)*xval - xd/(R+1)
-    xguess = xf*q
-    if R == -1:
-        R = -1 + 1e-10
-        xsol = xd
-        ysol = feed(xsol)
-    elif q == 1:
-        q == 1 + 1e-10
-        xsol = xf
-        ysol = rectifying(xsol)
+        ratio = f"{R/reflux['R_min']:.2f}" if reflux['R_min'] > 0 else '\u221e'
+        rtext = (f"Minimum reflux ratio: {reflux['R_min']:.3f} ({reflux['pinch']} pinch at x = {reflux['x_pinch']:.3f}), "
+                 f"R/R_min = {ratio}")
+    if minstages is None:
+        ntext = 'Minimum stages (total reflux): n/a'
+    elif np.isinf(minstages['N_min']):
+        ntext = 'Minimum stages (total reflux): unbounded'
     else:
-        xsol = fsolve(feedrectintersection, xguess)
-        ysol = rectifying(xsol)
-
-    if isinstance(xsol, np.ndarray):
-        xsol = xsol[0]
-    if isinstance(ysol, np.ndarray):
-        ysol = ysol[0]
-
-    def stripping(xval):
-        return (ysol-xb)*(xval-xb)/(xsol-xb)+xb
-
-    xfeedtorect = np.linspace(xf, xsol, 100)
-    yfeedtorect = (ysol-xf)*(xfeedtorect-xf)/(xsol-xf)+xf
-    xdisttofeed = np.linspace(xd, xsol, 100)
-    ydisttofeed = (ysol-xd)*(xdisttofeed-xd)/(xsol-xd)+xd
-    xbottofeed = np.linspace(xb, xsol, 100)
-    ybottofeed = (ysol-xb)*(xbottofeed-xb)/(xsol-xb)+xb
+        ntext = f"Minimum stages (total reflux): {minstages['N_min']:.2f} (Fenske {minstages['fenske']:.2f})"
+    return rtext, ntext
 
-    fig.add_trace(go.Scatter(x=xdisttofeed, y=ydisttofeed, mode='lines', name='Rectifying Section', line=dict(color='orange'), uid='rectifying'))
-    fig.add_trace(go.Scatter(x=xfeedtorect, y=yfeedtorect, mode='lines', name='Feed Section', line=dict(color='red'), uid='feed'))
-    fig.add_trace(go.Scatter(x=xbottofeed, y=ybottofeed, mode='lines', name='Stripping Section', line=dict(color='green'), uid='stripping'))
-
-stages = 0
-x = xd
-y = xd
-xs = [x]
-ys = [y]
-xhorzsegment = []
-yhorzsegment = []
-xrectvertsegment = []
-yrectvertsegment = []
-xstripvertsegment = []
-ystripvertsegment = []
-feedstage = 1
-while x > xb:
-    def difference(xval):
-        return p(xval) - y
-    intersect = fsolve(difference, 0)
-    if intersect > x or intersect == x:
-        print('Cannot perform McCabe-Thiele Method as equilibrium curve is below y=x at distillation composition')
-        break
-    if isinstance(x, np.ndarray):
-        x = x[0]
-    if isinstance(y, np.ndarray):
-        y = y[0]
-    if isinstance(intersect, np.ndarray):
-        intersect = intersect[0]
+def default_figure(curve):
+    fig = go.Figure()
+    xplot = np.linspace(0, 1, 201)
 
-    xhorzsegment.append(np.linspace(x, intersect, 100))
-    yhorzsegment.append(np.linspace(y, y, 100))
+    fig.add_trace(go.Scatter(x=xplot, y=curve(xplot), mode='lines', name='Equilibrium Line', line=dict(color='yellow'), uid='equilibrium'))
+    fig.add_trace(go.Scatter(x=[0, 1], y=[0, 1], mode='lines', name='y=x Line', line=dict(color='white'), uid='yx'))
 
-    if intersect > xsol:
-        xrectvertsegment.append(np.linspace(intersect, intersect, 100))
-        yrectvertsegment.append(np.linspace(y, rectifying(intersect), 100))
-        x = intersect
-        y = rectifying(intersect)
-        feedstage += 1
-    else:
-        xstripvertsegment.append(np.linspace(intersect, intersect, 100))
-        ystripvertsegment.append(np.linspace(y, stripping(intersect), 100))
-        x = intersect
-        y = stripping(intersect)
-    stages += 1
+    steps = step_stages(curve, xd, xb, xf, q, R)
+    xsol, ysol = steps['xsol'], steps['ysol']
 
-xhorzsegmentlist = [x for sublist in xhorzsegment for x in sublist]
-yhorzsegmentlist = [y for sublist in yhorzsegment for y in sublist]
-xrectvertsegmentlist = [x for sublist in xrectvertsegment for x in sublist]
-yrectvertsegmentlist = [y for sublist in yrectvertsegment for y in sublist]
-xstripvertsegmentlist = [x for sublist in xstripvertsegment for x in sublist]
-ystripvertsegmentlist = [y for sublist in ystripvertsegment for y in sublist]
+    # straight lines only need their endpoints
+    fig.add_trace(go.Scatter(x=[xd, xsol], y=[xd, ysol], mode='lines', name='Rectifying Section', line=dict(color='orange'), uid='rectifying'))
+    fig.add_trace(go.Scatter(x=[xf, xsol], y=[xf, ysol], mode='lines', name='Feed Section', line=dict(color='red'), uid='feed'))
+    fig.add_trace(go.Scatter(x=[xb, xsol], y=[xb, ysol], mode='lines', name='Stripping Section', line=dict(color='green'), uid='stripping'))
 
-fig.add_trace(go.Scatter(x=xhorzsegmentlist, y=yhorzsegmentlist, mode='lines', line=dict(color='white'), uid='horzsegment', showlegend=False))
-fig.add_trace(go.Scatter(x=xrectvertsegmentlist, y=yrectvertsegmentlist, mode='lines', line=dict(color='white'), uid='rectvertsegment', showlegend=False))
-fig.add_trace(go.Scatter(x=xstripvertsegmentlist, y=ystripvertsegmentlist, mode='lines', line=dict(color='white'), uid='stripvertsegment', showlegend=False))
+    stages, feedstage = steps['stages'], steps['feedstage']
+    xstairs, ystairs = staircase(steps)
+    fig.add_trace(go.Scatter(x=xstairs, y=ystairs, mode='lines', line=dict(color='white'), uid='staircase', showlegend=False))
 
-fig.add_trace(go.Scatter(x=[xd, xb, xf], y=[xd, xb, xf], mode='markers', marker=dict(color='red'), uid='markers'))
+    fig.add_trace(go.Scatter(x=[xd, xb, xf], y=[xd, xb, xf], mode='markers', marker=dict(color='red'), uid='markers'))
 
-fig.update_layout(
-    title=dict(
-        text=f"McCabe-Thiele Method for {comp1} + {comp2} at {T} K",
-        x=0.5,  # Center the title
-        xanchor='center',
-        font=dict(color='white', family='Merriweather Sans')  # Set title text color to white and font to Merriweather Sans
-    ),
-    xaxis=dict(
-        title=f'Liquid mole fraction {comp1}',
-        range=[0, 1],
-        constrain='domain',
-        title_font=dict(size=18, color='white', family='Merriweather Sans'),  # Increase x-axis title font size, set color to white, and font to Merriweather Sans
-        showgrid=False,  # Remove x-axis grid
-        ticks='outside',  # Add tick marks
-        ticklen=5,  # Length of tick marks
-        tickwidth=2,  # Width of tick marks
-        tickcolor='white',  # Color of tick marks
-        tickfont=dict(size=14, color='white', family='Merriweather Sans'),  # Set x-axis tick labels size, color to white, and font to Merriweather Sans
-        dtick=0.1  # Set tick increment to 0.1
-    ),
-    yaxis=dict(
-        title=f'Vapor mole fraction {comp1}',
-        range=[0, 1],
-        scaleanchor='x',
-        scaleratio=1,
-        title_font=dict(size=18, color='white', family='Merriweather Sans'),  # Increase y-axis title font size, set color to white, and font to Merriweather Sans
-        showgrid=False,  # Remove y-axis grid
-        ticks='outside',  # Add tick marks
-        ticklen=5,  # Length of tick marks
-        tickwidth=2,  # Width of tick marks
-        tickcolor='white',  # Color of tick marks
-        tickfont=dict(size=14, color='white', family='Merriweather Sans'),  # Set y-axis tick labels size, color to white, and font to Merriweather Sans
-        dtick=0.1  # Set tick increment to 0.1
-    ),
-    legend=dict(
-        x=0.75,  # Position legend inside the graph
-        y=0.1,
-        xanchor='left',
-        yanchor='bottom',
-        font=dict(color='white', family='Merriweather Sans')  # Set legend text color to white and font to Merriweather Sans
-    ),
-    margin=dict(l=10, r=10, t=40, b=10),  # Reduce margins to remove whitespace
-    plot_bgcolor='#08306b',  # Set plot background color to dark blue from CSS
-    paper_bgcolor='#08306b'  # Set paper background color to dark blue from CSS
-)
-
-layout = html.Div([
-    html.Div([
+    fig.update_layout(
+        title=dict(
+            text=f"McCabe-Thiele Method for {comp1} + {comp2} at {T} K",
+            x=0.5,  # Center the title
+            xanchor='center',
+            font=dict(color='white', family='Merriweather Sans')  # Set title text color to white and font to Merriweather Sans
+        ),
+        xaxis=dict(
+            title=f'Liquid mole fraction {comp1}',
+            range=[0, 1],
+            constrain='domain',
+            title_font=dict(size=18, color='white', family='Merriweather Sans'),  # Increase x-axis title font size, set color to white, and font to Merriweather Sans
+            showgrid=False,  # Remove x-axis grid
+            ticks='outside',  # Add tick marks
+            ticklen=5,  # Length of tick marks
+            tickwidth=2,  # Width of tick marks
+            tickcolor='white',  # Color of tick marks
+            tickfont=dict(size=14, color='white', family='Merriweather Sans'),  # Set x-axis tick labels size, color to white, and font to Merriweather Sans
+            dtick=0.1  # Set tick increment to 0.1
+        ),
+        yaxis=dict(
+            title=f'Vapor mole fraction {comp1}',
+            range=[0, 1],
+            scaleanchor='x',
+            scaleratio=1,
+            title_font=dict(size=18, color='white', family='Merriweather Sans'),  # Increase y-axis title font size, set color to white, and font to Merriweather Sans
+            showgrid=False,  # Remove y-axis grid
+            ticks='outside',  # Add tick marks
+            ticklen=5,  # Length of tick marks
+            tickwidth=2,  # Width of tick marks
+            tickcolor='white',  # Color of tick marks
+            tickfont=dict(size=14, color='white', family='Merriweather Sans'),  # Set y-axis tick labels size, color to white, and font to Merriweather Sans
+            dtick=0.1  # Set tick increment to 0.1
+        ),
+        legend=dict(
+            x=0.75,  # Position legend inside the graph
+            y=0.1,
+            xanchor='left',
+            yanchor='bottom',
+            font=dict(color='white', family='Merriweather Sans')  # Set legend text color to white and font to Merriweather Sans
+        ),
+        margin=dict(l=10, r=10, t=40, b=10),  # Reduce margins to remove whitespace
+        plot_bgcolor='#08306b',  # Set plot background color to dark blue from CSS
+        paper_bgcolor='#08306b'  # Set paper background color to dark blue from CSS
+    )
+    return fig, stages, feedstage
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_state():
+    # Built on the first visit instead of at import, so starting the app never waits on thermo (TxyPxyxy is
+    # only imported here and in the callbacks); the default curve normally comes from the prebuilt VLE library
+    global _default
+    with _default_lock:
+        if _default is None:
+            from TxyPxyxy import xy_data
+            curve = MonotoneCurve.from_points(*xy_data(comp1, comp2, T=T))
+            fig, stages, feedstage = default_figure(curve)
+            rmintext, nmintext = minimum_text(xd, xb, xf, q, R, curve)
+            _default = {'curve': curve.to_dict(), 'fig': fig, 'stages': stages, 'feedstage': feedstage,
+                        'rmintext': rmintext, 'nmintext': nmintext}
+    return _default
+
+def layout():
+    # the chemical-name index loads in the background from the first visit (never at startup or in a
+    # request); autocomplete and validation skip it until it is ready
+    chemindex.preload()
+    state = default_state()
+    return html.Div([
         html.Div([
-            html.Label('Component 1:', style={'display': 'inline-block', 'margin-right': '10px'}),
-            dcc.Input(id='comp1-input', type='text', value='methanol', style={'width': '100%', 'margin-bottom': '10px'}),
-            html.Label('Component 2:', style={'display': 'inline-block', 'margin-right': '10px'}),
-            dcc.Input(id='comp2-input', type='text', value='water', style={'width': '100%', 'margin-bottom': '10px'}),
-            html.Label('Temperature (K):', style={'display': 'inline-block', 'margin-right': '10px'}),
-            dcc.Input(id='temperature-input', type='number', value=300, style={'width': '100%', 'margin-bottom': '10px'}),
-            html.Label('Pressure (Pa):', style={'display': 'inline-block', 'margin-right': '10px'}),
-            dcc.Input(id='pressure-input', type='number', style={'width': '100%', 'margin-bottom': '10px'}),
-            html.Div([
-                html.Button('Submit', id='submit-button', n_clicks=0, style={'margin-bottom': '10px'}),
-                dcc.ConfirmDialog(
-                    id='confirm-dialog',
-                    message='',
-                ),
-            ], style={'margin-bottom': '10px'}),
-            html.Label(['Distillate composition (x', html.Sub('d'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Span(id='xd-display', style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Div([
-                dcc.Slider(id='xd-slider', 
-                           min=0, 
-                           max=1, 
-                           step=0.01, 
-                           value=0.9, 
-                           marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)}, 
-                           updatemode='drag',
-                           className='slider-orange'  # Assign class for styling
-                )
-            ], style={'margin-bottom': '5px'}),
-            html.Label(['Bottoms composition (x', html.Sub('b'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Span(id='xb-display', style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Div([
-                dcc.Slider(id='xb-slider', 
-                           min=0, 
-                           max=1, 
-                           step=0.01, 
-                           value=0.1, 
-                           marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)},
-                           updatemode='drag',
-                           className='slider-green'  # Assign class for styling
-                )
-            ], style={'margin-bottom': '5px'}),
-            html.Label(['Feed composition (x', html.Sub('f'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Span(id='xf-display', style={'display': 'inline-block', 'margin-right': '10px'}),
             html.Div([
-                dcc.Slider(id='xf-slider', 
-                           min=0, 
-                           max=1, 
-                           step=0.01, 
-                           value=0.5, 
-                           marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)},
-                           updatemode='drag',
-                           className='slider-red'  # Assign class for styling
-                )
-            ], style={'margin-bottom': '5px'}),
-            html.Label('Feed quality (q):', style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Span(id='q-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Label('Component 1:', style={'display': 'inline-block', 'margin-right': '10px'}),
+                dcc.Input(id='comp1-input', type='text', debounce=0.3, value='methanol', list='comp1-options', style={'width': '100%', 'margin-bottom': '10px'}),
+                html.Datalist(id='comp1-options'),
+                html.Label('Component 2:', style={'display': 'inline-block', 'margin-right': '10px'}),
+                dcc.Input(id='comp2-input', type='text', debounce=0.3, value='water', list='comp2-options', style={'width': '100%', 'margin-bottom': '10px'}),
+                html.Datalist(id='comp2-options'),
+                html.Label('Temperature (K):', style={'display': 'inline-block', 'margin-right': '10px'}),
+                dcc.Input(id='temperature-input', type='number', value=300, style={'width': '100%', 'margin-bottom': '10px'}),
+                html.Label('Pressure (Pa):', style={'display': 'inline-block', 'margin-right': '10px'}),
+                dcc.Input(id='pressure-input', type='number', style={'width': '100%', 'margin-bottom': '10px'}),
+                html.Div([
+                    html.Button('Submit', id='submit-button', n_clicks=0, style={'margin-bottom': '10px'}),
+                    dcc.ConfirmDialog(
+                        id='confirm-dialog',
+                        message='',
+                    ),
+                ], style={'margin-bottom': '10px'}),
+                html.Label(['Distillate composition (x', html.Sub('d'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Span(id='xd-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Div([
+                    dcc.Slider(id='xd-slider', 
+                               min=0, 
+                               max=1, 
+                               step=0.01, 
+                               value=0.9, 
+                               marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)}, 
+                               updatemode='drag',
+                               className='slider-orange'  # Assign class for styling
+                    )
+                ], style={'margin-bottom': '5px'}),
+                html.Label(['Bottoms composition (x', html.Sub('b'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Span(id='xb-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Div([
+                    dcc.Slider(id='xb-slider', 
+                               min=0, 
+                               max=1, 
+                               step=0.01, 
+                               value=0.1, 
+                               marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)},
+                               updatemode='drag',
+                               className='slider-green'  # Assign class for styling
+                    )
+                ], style={'margin-bottom': '5px'}),
+                html.Label(['Feed composition (x', html.Sub('f'), '):'], style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Span(id='xf-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Div([
+                    dcc.Slider(id='xf-slider', 
+                               min=0, 
+                               max=1, 
+                               step=0.01, 
+                               value=0.5, 
+                               marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 1, 0.1)},
+                               updatemode='drag',
+                               className='slider-red'  # Assign class for styling
+                    )
+                ], style={'margin-bottom': '5px'}),
+                html.Label('Feed quality (q):', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Span(id='q-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Div([
+                    dcc.Slider(id='q-slider', 
+                               min=-2, 
+                               max=2, 
+                               step=0.1, 
+                               value=0.5, 
+                               marks={float(i): str(round(float(i), 1)) for i in np.arange(-2, 2, 0.5)},
+                               updatemode='drag',
+                               className='slider-blue'  # Assign class for styling
+                    )
+                ], style={'margin-bottom': '5px'}),
+                html.Label('Reflux ratio (R):', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Span(id='R-display', style={'display': 'inline-block', 'margin-right': '10px'}),
+                html.Div([
+                    dcc.Slider(id='R-slider', 
+                               min=0, 
+                               max=10, 
+                               step=0.1, 
+                               value=2, 
+                               marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 10, 0.5)},
+                               updatemode='drag',
+                               className='slider-purple'  # Assign class for styling
+                    )
+                ], style={'margin-bottom': '5px'}),
+            ], style={'width': '40%', 'display': 'inline-block', 'vertical-align': 'top', 'padding': '10px'}),
             html.Div([
-                dcc.Slider(id='q-slider', 
-                           min=-2, 
-                           max=2, 
-                           step=0.1, 
-                           value=0.5, 
-                           marks={float(i): str(round(float(i), 1)) for i in np.arange(-2, 2, 0.5)},
-                           updatemode='drag',
-                           className='slider-blue'  # Assign class for styling
-                )
-            ], style={'margin-bottom': '5px'}),
-            html.Label('Reflux ratio (R):', style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Span(id='R-display', style={'display': 'inline-block', 'margin-right': '10px'}),
-            html.Div([
-                dcc.Slider(id='R-slider', 
-                           min=0, 
-                           max=10, 
-                           step=0.1, 
-                           value=2, 
-                           marks={float(i): str(round(float(i), 1)) for i in np.arange(0, 10, 0.5)},
-                           updatemode='drag',
-                           className='slider-purple'  # Assign class for styling
-                )
-            ], style={'margin-bottom': '5px'}),
-        ], style={'width': '40%', 'display': 'inline-block', 'vertical-align': 'top', 'padding': '10px'}),
-        html.Div([
-            dcc.Graph(id='mccabe-plot', figure=fig),
-            html.Div(id='stages-output', style={'margin-top': '20px'}, children=f"Number of stages: {stages}"),
-            html.Div(id='feed-stages-output', style={'margin-top': '20px'}, children=f"Feed stage: {feedstage}"),
-        ], style={'width': '60%', 'display': 'inline-block', 'vertical-align': 'top', 'padding': '10px'}),
-    ], style={'display': 'flex'}),
-    dcc.Store(id='xi-store', data=xi), # the data here is the initial value and will be changed by the slider
-    dcc.Store(id='yi-store', data=yi),
-    dcc.Store(id='z-store', data=z),
-])
+                dcc.Graph(id='mccabe-plot', figure=state['fig']),
+                html.Div(id='stages-output', style={'margin-top': '20px'}, children=f"Number of stages: {state['stages']}"),
+                html.Div(id='feed-stages-output', style={'margin-top': '20px'}, children=f"Feed stage: {state['feedstage']}"),
+                html.Div(id='rmin-output', style={'margin-top': '20px'}, children=state['rmintext']),
+                html.Div(id='nmin-output', style={'margin-top': '20px'}, children=state['nmintext']),
+                html.Div([
+                    html.Label('Design sweep:', style={'display': 'inline-block', 'margin-right': '10px'}),
+                    dcc.RadioItems(id='sweep-mode', value='off', inline=True, style={'display': 'inline-block'},
+                                   inputStyle={'margin-left': '10px', 'margin-right': '4px'},
+                                   options=[{'label': 'Off', 'value': 'off'},
+                                            {'label': 'Stages vs R and q', 'value': 'Rq'},
+                                            {'label': ['Stages vs x', html.Sub('d'), ' and x', html.Sub('b')], 'value': 'xdxb'}]),
+                    html.Button('Update sweep', id='sweep-button', n_clicks=0, style={'margin-left': '10px'}),
+                ], style={'margin-top': '20px'}),
+                dcc.Graph(id='sweep-plot', style={'display': 'none'}),
+            ], style={'width': '60%', 'display': 'inline-block', 'vertical-align': 'top', 'padding': '10px'}),
+        ], style={'display': 'flex'}),
+        dcc.Store(id='curve-store', data=state['curve']), # monotone spline knots, replaced when the pair changes
+        # pair, condition and next fidelity tier for the progressive refinement after Submit
+        dcc.Store(id='refine-store'),
+        dcc.Store(id='final-store'),
+    ])
 
 @callback(
     Output('confirm-dialog', 'displayed'),
     Output('confirm-dialog', 'message'),
-    Output('xi-store', 'data'),
-    Output('yi-store', 'data'),
-    Output('z-store', 'data'),
+    Output('curve-store', 'data'),
     Output('mccabe-plot', 'figure'),
+    Output('refine-store', 'data'),
     Input('submit-button', 'n_clicks'),
     State('comp1-input', 'value'),
     State('comp2-input', 'value'),
@@ -326,20 +294,111 @@ def compute_xy(n_clicks, comp1, comp2, T, P):
             dtick=0.1  # Set tick increment to 0.1
         ))
         if T is not None and P is not None:
-            return True, 'If you input both temperature and pressure, the graphing will not work.', dash.no_update, dash.no_update
+            return True, 'If you input both temperature and pressure, the graphing will not work.', dash.no_update, dash.no_update, dash.no_update
         if not comp1 or not comp2 or (T is None and P is None):
-            return True, 'You must input both components and at least a temperature or a pressure to graph.', dash.no_update, dash.no_update
+            return True, 'You must input both components and at least a temperature or a pressure to graph.', dash.no_update, dash.no_update, dash.no_update
         
-        if P is None:
-            xi, yi = xy(comp1, comp2, T=T, values=True, show=False)
-        else:
-            xi, yi = xy(comp1, comp2, P=P, values=True, show=False)
-        z = np.polyfit(xi, yi, 20)
+        # names are checked against the local index so a typo never reaches thermo's slow database lookup;
+        # while the index is still loading they go straight to thermo, whose errors are reported below
+        for comp in (comp1, comp2) if chemindex.is_loaded() else ():
+            known, suggestions = chemindex.validate_name(comp)
+            if not known:
+                message = f"Unknown component '{comp}'."
+                if suggestions:
+                    message += ' Did you mean: ' + ', '.join(suggestions) + '?'
+                return True, message, dash.no_update, dash.no_update, dash.no_update
+
+        # the ideal-solution curve is plotted right away, refine_xy and finalize_xy then push the Wilson
+        # and full UNIFAC curves as each one finishes
+        condition = {'T': T} if P is None else {'P': P/1e5} # the pressure input is in Pa, xy_data takes bar
+        request = dict(condition, comp1=comp1, comp2=comp2, submit=n_clicks)
+        try:
+            curve = refined_curve(dict(request, fidelity=refinement[0]))
+        except Exception as e:
+            return True, f'Could not compute the equilibrium curve: {e}', dash.no_update, dash.no_update, dash.no_update
         
-        return False, '', xi, yi, z, fig
-    return False, '', dash.no_update, dash.no_update, z, fig
+        return False, '', curve, fig, dict(request, fidelity=refinement[1])
+    return False, '', dash.no_update, fig, dash.no_update
 
+min_prefix = 2 # shorter prefixes match too much to be useful suggestions
+
+def name_options(prefix):
+    prefix = (prefix or '').strip()
+    if len(prefix) < min_prefix or not chemindex.is_loaded():
+        return []
+    return [html.Option(value=name) for name in chemindex.complete_name(prefix)]
+
+# Suggestions once typing pauses for 0.3 s (the inputs are debounced), not on page load
 @callback(
+    Output('comp1-options', 'children'),
+    Input('comp1-input', 'value'),
+    prevent_initial_call=True
+)
+def complete_comp1(prefix):
+    return name_options(prefix)
+
+@callback(
+    Output('comp2-options', 'children'),
+    Input('comp2-input', 'value'),
+    prevent_initial_call=True
+)
+def complete_comp2(prefix):
+    return name_options(prefix)
+
+refinement = ('ideal', 'wilson', 'unifac') # fidelity tiers in the order they are plotted after Submit
+
+def refined_curve(request):
+    from TxyPxyxy import xy_data # imported on first use, see default_state
+    request = dict(request)
+    comp1, comp2 = request.pop('comp1'), request.pop('comp2')
+    request.pop('submit', None)
+    xi, yi = xy_data(comp1, comp2, **request)
+    return MonotoneCurve.from_points(xi, yi).to_dict()
+
+def refinement_failed(request, e):
+    # a failed refinement keeps the curve already plotted and says so instead of erroring the callback
+    return True, f"Could not refine the equilibrium curve with {request['fidelity']}, keeping the previous one: {e}"
+
+@callback(
+    Output('confirm-dialog', 'displayed', allow_duplicate=True),
+    Output('confirm-dialog', 'message', allow_duplicate=True),
+    Output('curve-store', 'data', allow_duplicate=True),
+    Output('final-store', 'data'),
+    Input('refine-store', 'data'),
+    State('submit-button', 'n_clicks'),
+    prevent_initial_call=True
+)
+def refine_xy(request, n_clicks):
+    # a refinement left over from an earlier Submit must not overwrite the newer pair
+    if not request or request['submit'] != n_clicks:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    try:
+        curve = refined_curve(request)
+    except Exception as e:
+        return *refinement_failed(request, e), dash.no_update, dash.no_update
+    return dash.no_update, dash.no_update, curve, dict(request, fidelity=refinement[2])
+
+@callback(
+    Output('confirm-dialog', 'displayed', allow_duplicate=True),
+    Output('confirm-dialog', 'message', allow_duplicate=True),
+    Output('curve-store', 'data', allow_duplicate=True),
+    Input('final-store', 'data'),
+    State('submit-button', 'n_clicks'),
+    prevent_initial_call=True
+)
+def finalize_xy(request, n_clicks):
+    if not request or request['submit'] != n_clicks:
+        return dash.no_update, dash.no_update, dash.no_update
+    try:
+        curve = refined_curve(request)
+    except Exception as e:
+        return *refinement_failed(request, e), dash.no_update
+    return dash.no_update, dash.no_update, curve
+
+# Everything that follows a slider runs in the browser (assets/mccabe.js) from the spline in curve-store,
+# so dragging never calls the server; only a new component pair or condition goes through compute_xy.
+clientside_callback(
+    ClientsideFunction(namespace='mccabe', function_name='update_plot'),
     Output('mccabe-plot', 'figure', allow_duplicate=True),
     Output('stages-output', 'children'),
     Output('feed-stages-output', 'children'),
@@ -347,215 +406,18 @@ def compute_xy(n_clicks, comp1, comp2, T, P):
     Input('xb-slider', 'value'),
     Input('xf-slider', 'value'),
     Input('q-slider', 'value'),
-    Input('R-slider', 'value'), # add inputs from text boxes for components?
-    Input('xi-store', 'data'),
-    Input('yi-store', 'data'),
-    Input('z-store', 'data'),
+    Input('R-slider', 'value'),
+    Input('curve-store', 'data'),
     State('comp1-input', 'value'),
     State('comp2-input', 'value'),
     State('temperature-input', 'value'),
     State('pressure-input', 'value'),
+    State('mccabe-plot', 'figure'),
     prevent_initial_call=True
 )
-def update_plot(xd, xb, xf, q, R, xi, yi, z, comp1, comp2, T, P): # use Patch to update the plot
-    p = np.poly1d(z)
-
-    patched_figure = Patch()
-    patched_figure['data'] = []
-
-    patched_figure['data'].extend([
-        {'name': 'Equilibrium Line', 'x': xi, 'y': p(xi), 'mode': 'lines', 'line': {'color': 'yellow'}},
-        {'name': 'y=x Line', 'x': xi, 'y': xi, 'mode': 'lines', 'line': {'color': 'white'}}
-    ])
-
-    if q is not None and R is not None:
-        def rectifying(xval):
-            return R/(R+1)*xval + xd/(R+1)
-        def feed(xval):
-            return q/(q-1)*xval - xf/(q-1)
-        def feedrectintersection(xval):
-            return q/(q-1)*xval - xf/(q-1) - R/(R+1)*xval - xd/(R+1)
-        xguess = xf*q
-        if R == -1:
-            R = -1 + 1e-10
-            xsol = xd
-            ysol = feed(xsol)
-        elif q == 1:
-            q == 1 + 1e-10
-            xsol = xf
-            ysol = rectifying(xsol)
-        else:
-            xsol = fsolve(feedrectintersection, xguess)
-            ysol = rectifying(xsol)
-
-        if isinstance(xsol, np.ndarray):
-            xsol = xsol[0]
-        if isinstance(ysol, np.ndarray):
-            ysol = ysol[0]
-
-        def stripping(xval):
-            return (ysol-xb)*(xval-xb)/(xsol-xb)+xb
 
-        xfeedtorect = np.linspace(xf, xsol, 100)
-        yfeedtorect = (ysol-xf)*(xfeedtorect-xf)/(xsol-xf)+xf
-        xdisttofeed = np.linspace(xd, xsol, 100)
-        ydisttofeed = (ysol-xd)*(xdisttofeed-xd)/(xsol-xd)+xd
-        xbottofeed = np.linspace(xb, xsol, 100)
-        ybottofeed = (ysol-xb)*(xbottofeed-xb)/(xsol-xb)+xb
-        patched_figure['data'].extend([
-            {
-                'name': 'Rectifying Section',
-                'x': xdisttofeed,
-                'y': ydisttofeed,
-                'mode': 'lines',
-                'line': {'color': 'orange'}
-            },
-            {
-                'name': 'Feed Section',
-                'x': xfeedtorect,
-                'y': yfeedtorect,
-                'mode': 'lines',
-                'line': {'color': 'red'}
-            },
-            {
-                'name': 'Stripping Section',
-                'x': xbottofeed,
-                'y': ybottofeed,
-                'mode': 'lines',
-                'line': {'color': 'green'}
-            }
-        ])
-        stages = 0
-        x = xd
-        y = xd
-        xhorzsegment = []
-        yhorzsegment = []
-        xrectvertsegment = []
-        yrectvertsegment = []
-        xstripvertsegment = []
-        ystripvertsegment = []
-        feedstage = 1
-        while x > xb:
-            def difference(xval):
-                return p(xval) - y
-            intersect = fsolve(difference, 0)
-            if intersect > x or intersect == x:
-                print('Cannot perform McCabe-Thiele Method as equilibrium curve is below y=x at distillation composition')
-                break
-            if isinstance(x, np.ndarray):
-                x = x[0]
-            if isinstance(y, np.ndarray):
-                y = y[0]
-            if isinstance(intersect, np.ndarray):
-                intersect = intersect[0]
-
-            xhorzsegment.append(np.linspace(x, intersect, 100))
-            yhorzsegment.append(np.linspace(y, y, 100))
-
-            if intersect > xsol:
-                xrectvertsegment.append(np.linspace(intersect, intersect, 100))
-                yrectvertsegment.append(np.linspace(y, rectifying(intersect), 100))
-                x = intersect
-                y = rectifying(intersect)
-                feedstage += 1
-            else:
-                yend = (ysol-xb)*(intersect-xb)/(xsol-xb)+xb
-                xstripvertsegment.append(np.linspace(intersect, intersect, 100))
-                if yend < intersect:
-                    ystripvertsegment.append(np.linspace(y, intersect, 100))
-                else:
-                    ystripvertsegment.append(np.linspace(y, (ysol-xb)*(intersect-xb)/(xsol-xb)+xb, 100))
-                x = intersect
-                y = (ysol-xb)*(x-xb)/(xsol-xb)+xb
-            stages += 1
-
-        xhorzsegmentlist = [x for sublist in xhorzsegment for x in sublist]
-        yhorzsegmentlist = [y for sublist in yhorzsegment for y in sublist]
-        xrectvertsegmentlist = [x for sublist in xrectvertsegment for x in sublist]
-        yrectvertsegmentlist = [y for sublist in yrectvertsegment for y in sublist]
-        xstripvertsegmentlist = [x for sublist in xstripvertsegment for x in sublist]
-        ystripvertsegmentlist = [y for sublist in ystripvertsegment for y in sublist]
-
-    patched_figure['data'].extend([
-        {
-            'name': 'horzsegment',
-            'x': xhorzsegmentlist,
-            'y': yhorzsegmentlist,
-            'mode': 'lines',
-            'line': {'color': 'white'},
-            'showlegend': False
-        },
-        {
-            'name': 'rectvertsegment',
-            'x': xrectvertsegmentlist,
-            'y': yrectvertsegmentlist,
-            'mode': 'lines',
-            'line': {'color': 'white'},
-            'showlegend': False
-        },
-        {
-            'name': 'stripvertsegment',
-            'x': xstripvertsegmentlist,
-            'y': ystripvertsegmentlist,
-            'mode': 'lines',
-            'line': {'color': 'white'},
-            'showlegend': False
-        }
-    ])
-
-    patched_figure['data'].extend([
-        {
-            'name': 'Rectifying Dot',
-            'x': [xd],
-            'y': [xd],
-            'mode': 'markers',
-            'marker': {'color': 'orange', 'size': 10},
-            'showlegend': False
-        },
-        {
-            'name': 'Stripping Dot',
-            'x': [xb],
-            'y': [xb],
-            'mode': 'markers',
-            'marker': {'color': 'green', 'size': 10},
-            'showlegend': False
-        },
-        {
-            'name': 'Feed Dot',
-            'x': [xf],
-            'y': [xf],
-            'mode': 'markers',
-            'marker': {'color': 'red', 'size': 10},
-            'showlegend': False
-        }
-    ])
-
-    if T is not None:
-        figtitle = f"McCabe-Thiele Method for {comp1} + {comp2} at {T} K"
-    else:
-        figtitle = f"McCabe-Thiele Method for {comp1} + {comp2} at {P} Pa"
-    patched_figure['layout'].update(
-        title=dict(
-            text=figtitle,
-            x=0.5,  # Center the title
-            xanchor='center',
-            font=dict(color='white', family='Merriweather Sans')  # Set title text color to white and font to Merriweather
-        ),
-        legend=dict(
-            x=0.75,  # Position legend inside the graph
-            y=0.1,
-            xanchor='left',
-            yanchor='bottom',
-            font=dict(color='white', family='Merriweather Sans')  # Set legend text color to white and font to Merriweather
-        ),
-        margin=dict(l=10, r=10, t=40, b=10),  # Reduce margins to remove whitespace
-        plot_bgcolor='#08306b',  # Set plot background color to dark blue from CSS
-        paper_bgcolor='#08306b'  # Set paper background color to dark blue from CSS
-    )
-
-    return patched_figure, f"Number of stages: {stages}", f"Feed stage: {feedstage}"
-
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace='mccabe', function_name='slider_values'),
     Output('xd-display', 'children'),
     Output('xb-display', 'children'),
     Output('xf-display', 'children'),
@@ -567,15 +429,9 @@ def update_plot(xd, xb, xf, q, R, xi, yi, z, comp1, comp2, T, P): # use Patch to
     Input('q-slider', 'value'),
     Input('R-slider', 'value')
 )
-def update_slider_values(xd, xb, xf, q, R):
-    xd_display = html.Span(['x', html.Sub('d'), f' = {xd:.2f}'])
-    xb_display = html.Span(['x', html.Sub('b'), f' = {xb:.2f}'])
-    xf_display = html.Span(['x', html.Sub('f'), f' = {xf:.2f}'])
-    q_display = f'q = {q:.1f}'
-    R_display = f'R = {R:.1f}'
-    return xd_display, xb_display, xf_display, q_display, R_display
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace='mccabe', function_name='enforce_constraints'),
     Output('xd-slider', 'value'),
     Output('xf-slider', 'value'),
     Output('xb-slider', 'value'),
@@ -583,23 +439,68 @@ def update_slider_values(xd, xb, xf, q, R):
     Input('xf-slider', 'value'),
     Input('xb-slider', 'value')
 )
-def enforce_constraints(xd, xf, xb):
-    ctx = callback_context
-    if not ctx.triggered:
-        return xd, xf, xb
 
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+# minimum reflux (feed and tangent pinches) and minimum stages at total reflux, live with the sliders
+clientside_callback(
+    ClientsideFunction(namespace='mccabe', function_name='minimum_text'),
+    Output('rmin-output', 'children'),
+    Output('nmin-output', 'children'),
+    Input('xd-slider', 'value'),
+    Input('xb-slider', 'value'),
+    Input('xf-slider', 'value'),
+    Input('q-slider', 'value'),
+    Input('R-slider', 'value'),
+    Input('curve-store', 'data'),
+    prevent_initial_call=True
+)
 
-    if triggered_id == 'xd-slider':
-        if xd < xf:
-            xd = xf + 0.01
-    elif triggered_id == 'xf-slider':
-        if xf > xd:
-            xf = xd - 0.01
-        if xf < xb:
-            xf = xb + 0.01
-    elif triggered_id == 'xb-slider':
-        if xb > xf:
-            xb = xf - 0.01
+@lru_cache(maxsize=32)
+def cached_sweep(curve_json, mode, fixed):
+    # keyed on the serialized curve, so every pair and condition keeps its own sweeps, and on the (name, value)
+    # pairs of the variables held fixed only: moving a slider along a swept axis gives the same heatmap
+    design = dict.fromkeys(('xd', 'xb', 'xf', 'q', 'R'))
+    design.update(fixed)
+    return design_sweep(MonotoneCurve.from_dict(json.loads(curve_json)), mode, **design)
 
-    return xd, xf, xb
+# Stage counts over a grid of designs, computed by the batched stepper when the mode, curve or button changes.
+# The sliders are read as State so dragging them stays clientside.
+@callback(
+    Output('sweep-plot', 'figure'),
+    Output('sweep-plot', 'style'),
+    Input('sweep-mode', 'value'),
+    Input('sweep-button', 'n_clicks'),
+    Input('curve-store', 'data'),
+    State('xd-slider', 'value'),
+    State('xb-slider', 'value'),
+    State('xf-slider', 'value'),
+    State('q-slider', 'value'),
+    State('R-slider', 'value'),
+)
+def update_sweep(mode, n_clicks, curve, xd, xb, xf, q, R):
+    if mode == 'off' or not curve:
+        return dash.no_update, {'display': 'none'}
+    current = {'xd': xd, 'xb': xb, 'xf': xf, 'q': q, 'R': R}
+    swept = (sweep_modes[mode][0], sweep_modes[mode][2])
+    fixed = tuple((name, value) for name, value in current.items() if name not in swept)
+    sweep = cached_sweep(json.dumps(curve, sort_keys=True), mode, fixed)
+    sweepfig = go.Figure()
+    sweepfig.add_trace(go.Heatmap(
+        x=sweep['x'], y=sweep['y'], z=sweep['stages'], customdata=sweep['feedstage'], colorscale='Viridis',
+        colorbar=dict(title='Stages', tickfont=dict(color='white'), title_font=dict(color='white')),
+        hovertemplate=f"{sweep['x_name']} = %{{x}}<br>{sweep['y_name']} = %{{y}}<br>stages = %{{z}}<br>feed stage = %{{customdata}}<extra></extra>",
+    ))
+    sweepfig.add_trace(go.Scatter(x=[current[sweep['x_name']]], y=[current[sweep['y_name']]], mode='markers',
+                                  marker=dict(color='red', size=10, line=dict(color='white', width=1)),
+                                  name='Current design', showlegend=False))
+    axis = dict(title_font=dict(size=18, color='white', family='Merriweather Sans'), showgrid=False,
+                tickfont=dict(size=14, color='white', family='Merriweather Sans'))
+    sweepfig.update_layout(
+        title=dict(text='Theoretical stages (blank: pinched or infeasible)', x=0.5, xanchor='center',
+                   font=dict(color='white', family='Merriweather Sans')),
+        xaxis=dict(axis, title=sweep['x_name']),
+        yaxis=dict(axis, title=sweep['y_name']),
+        margin=dict(l=10, r=10, t=40, b=10),
+        plot_bgcolor='#08306b',
+        paper_bgcolor='#08306b'
+    )
+    return sweepfig, {'display': 'block'}
@@ -2,9 +2,10 @@ from dash import dcc, html, Input, Output, State, callback
 import dash
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
 import numpy as np
-from scipy.integrate import solve_ivp
 import re
+from reactionnetwork import ReactionNetwork, integrate, sample, time_scale, ensemble_percentiles
 
 dash.register_page(__name__, path='/kinetics', name="Reaction Kinetics")
 
@@ -14,27 +15,21 @@ def subscript_numbers(species):
 
 # Function to detect unique species in the order they appear
 def detect_unique_species_ordered(reactions):
-    ordered_species = []
-    unique_species = set()
-    
-    for reaction in reactions:
-        # Split the reaction into reactants and products
-        reactants, products = reaction.split('->')
-        
-        # Extract species from reactants and products
-        reactant_species = [re.sub(r'^\d*\*?', '', species.strip()) for species in reactants.split('+')]
-        product_species = [re.sub(r'^\d*\*?', '', species.strip()) for species in products.split('+')]
-        
-        # Add species to the ordered list if they are not already in the set
-        for species in reactant_species + product_species:
-            if species not in unique_species:
-                unique_species.add(species)
-                ordered_species.append(species)
-    
-    return ordered_species
+    return ReactionNetwork.from_reactions(reactions).species
+
+# Uncertainty bands: rate constants drawn uniformly within k*(1 +- uncertainty/100), the whole ensemble integrated
+# as one stacked system, and each species drawn as its median with a 5th-95th percentile band
+ensemble_samples = 200
+band_percentiles = (5, 50, 95)
+
+def sample_rate_constants(ks, uncertainties, samples = ensemble_samples, seed = 0):
+    # (samples, reactions); a fixed seed so the same inputs always give the same bands
+    ks = np.asarray(ks, dtype=float)
+    spread = np.clip(np.asarray(uncertainties, dtype=float), 0, 99)/100
+    return ks*np.random.default_rng(seed).uniform(1 - spread, 1 + spread, (samples, len(ks)))
 
 # Function to generate the reaction graph
-def reactiongraphing(reactions, ks, C0):
+def reactiongraphing(reactions, ks, C0, uncertainties = None):
     # Check that the number of ks elements matches the number of reactions
     if len(ks) != len(reactions):
         raise ValueError("The number of rate constants does not match the number of reactions.")
@@ -43,76 +38,58 @@ def reactiongraphing(reactions, ks, C0):
     def format_species(species):
         return re.sub(r'(\d+)', r'<sub>\1</sub>', species)
 
-    # Extract unique species from reactions in the order they appear
-    ordered_species = detect_unique_species_ordered(reactions)
+    # Compile the network once: stoichiometry and reaction-order matrices, species in the order they appear
+    network = ReactionNetwork.from_reactions(reactions)
+    ordered_species = network.species
 
     # Check that all unique species are present in C0
     if not set(ordered_species).issubset(C0.keys()):
         missing_species = set(ordered_species) - set(C0.keys())
         raise ValueError(f"The following species are missing in C0: {missing_species}")
 
-    # Define the system of ODEs
-    def odes(t, y):
-        dydt = np.zeros(len(ordered_species))
-        concentrations = {species: y[i] for i, species in enumerate(ordered_species)}
-        for i, reaction in enumerate(reactions):
-            reactants, products = reaction.split('->')
-            reactant_species = []
-            for species in reactants.split('+'):
-                coeff, sp = re.match(r'(\d*)(\w+)', species).groups()
-                coeff = int(coeff) if coeff else 1
-                reactant_species.append((sp, coeff))
-            
-            # Calculate the reaction rate
-            rate = ks[i] * np.prod([concentrations[sp]**coeff for sp, coeff in reactant_species])
-            
-            # Update differential forms
-            for sp, coeff in reactant_species:
-                dydt[ordered_species.index(sp)] -= rate * coeff
-            
-            for product in products.split('+'):
-                coeff, sp = re.match(r'(\d*)(\w+)', product).groups()
-                coeff = int(coeff) if coeff else 1
-                dydt[ordered_species.index(sp)] += rate * coeff
-        
-        return dydt
-
     # Initial concentrations
-    y0 = [C0[species] for species in ordered_species]
+    y0 = [float(C0[species]) for species in ordered_species]
 
-    # Time span for the simulation
-    t_span = (0, 10)
-    t_eval = np.linspace(t_span[0], t_span[1], 1000)
+    # Integration horizon: starts at 10 times the fastest time scale at C0 (10 when nothing decays yet, as in
+    # autocatalysis or growth like A -> 2A) and grows tenfold until the concentrations reach steady state, up to
+    # a million times the slowest time scale (so stiff networks are not cut off by their fast modes) or 20000
+    # steps. A run whose concentrations grow past a million times the initial ones stops there as diverged.
+    scale = time_scale(network, ks, y0)
+    horizon = 10*scale if scale is not None else 10.0
+    max_time = 1e6*max(horizon, time_scale(network, ks, y0, slowest=True) or 0.0)
 
-    # Solve the ODEs
-    solution = solve_ivp(odes, t_span, y0, t_eval=t_eval, method='RK45')
+    # Solve the ODEs, dC/dt = S @ (k * prod(C**orders)) with its exact Jacobian; the solver switches to BDF
+    # when the network is stiff (widely separated rate constants), and a terminal event stops it at steady state
+    solution = integrate(network, ks, y0, (0, horizon), steady_tol=1e-3, growth=10, max_time=max_time,
+                         max_steps=20000, max_growth=1e6)
+    steady_state_time = solution['t'][-1]
 
-    # Determine the steady state time
-    max_concentration = np.max(solution.y)
-    print(f"Max concentration: {max_concentration}")
-    
-    relative_tolerance = max_concentration * 1e-4  # Relative tolerance based on the maximum concentration
-    print(f"Relative tolerance: {relative_tolerance}")
-    
-    steady_state_time = t_span[1]
-    print(f"Initial steady state time: {steady_state_time}")
-    
-    for i in range(1, len(solution.t)):
-        concentration_diff = np.abs(solution.y[:, i] - solution.y[:, i-1])
-        print(f"Time: {solution.t[i]}, Concentration difference: {concentration_diff}")
-        
-        if np.all(concentration_diff < relative_tolerance):
-            steady_state_time = solution.t[i]
-            print(f"Steady state reached at time: {steady_state_time}")
-            break
-    
-    print(f"Final steady state time: {steady_state_time}")
+    # Output points placed where the concentrations change, from the dense output
+    t, y = sample(solution)
+
+    # With uncertainty ranges, the sampled sets are integrated over the same output points
+    bands = None
+    if uncertainties is not None and any(uncertainties):
+        bands, ensemble = ensemble_percentiles(network, sample_rate_constants(ks, uncertainties), y0, t,
+                                               band_percentiles)
+        t = ensemble['t']
 
     # Create the plotly figure
     fig = go.Figure()
     for i, species in enumerate(ordered_species):
         formatted_species = format_species(species)
-        fig.add_trace(go.Scatter(x=solution.t, y=solution.y[i], mode='lines', name=formatted_species))
+        if bands is None:
+            fig.add_trace(go.Scatter(x=t, y=y[i], mode='lines', name=formatted_species))
+            continue
+        # three traces per species: lower and upper percentile (filled between) and the median
+        color = DEFAULT_PLOTLY_COLORS[i % len(DEFAULT_PLOTLY_COLORS)]
+        fill = color.replace('rgb(', 'rgba(').replace(')', ', 0.25)')
+        fig.add_trace(go.Scatter(x=t, y=bands[0, i], mode='lines', line=dict(width=0), legendgroup=species,
+                                 showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=t, y=bands[2, i], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor=fill, legendgroup=species, showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=t, y=bands[1, i], mode='lines', line=dict(color=color), legendgroup=species,
+                                 name=formatted_species))
 
     fig.update_layout(
         title=dict(
@@ -140,7 +117,7 @@ def reactiongraphing(reactions, ks, C0):
             tickwidth=2,
             tickcolor='white',
             gridcolor='rgba(0,0,0,0)',
-            range=[0, np.max(solution.y)]
+            range=[0, np.max(y) if bands is None else max(np.max(y), np.max(bands))]
         ),
         template='plotly_dark',
         plot_bgcolor='#08306b',  # Set plot background color
@@ -150,7 +127,20 @@ def reactiongraphing(reactions, ks, C0):
         height=500
     )
 
-    return fig
+    info = (f"Solver: {solution['method']}, {solution['steps']} steps, {solution['nfev']} RHS evaluations, "
+            f"{solution['njev']} Jacobian evaluations")
+    if solution['diverged']:
+        info += f", diverged (concentrations past 1e6 times the initial) at t = {steady_state_time:.3g}"
+    elif solution['steady_state'] is not None:
+        info += f", steady state at t = {solution['steady_state']:.3g}"
+    else:
+        info += f", no steady state by t = {steady_state_time:.3g}"
+    if not solution['success']:
+        info += f" (stopped early: {solution['message']})"
+    if bands is not None:
+        info += (f". Bands: {ensemble_samples} sampled rate-constant sets, {band_percentiles[0]}th-"
+                 f"{band_percentiles[2]}th percentile, {ensemble['method']}, {ensemble['steps']} steps")
+    return fig, info
 
 # Layout of the page
 layout = html.Div([
@@ -159,7 +149,9 @@ layout = html.Div([
             dbc.InputGroupText("Elementary Reaction:", style={'margin-left': '2px'}),
             dbc.Input(id={'type': 'reaction-input', 'index': 0}, placeholder='e.g., 2H2 + O2 -> 2H2O', type='text', style={'margin-right': '10px', 'margin-left': '10px', 'width': '500px'}),
             dbc.InputGroupText("Rate Constant:"),
-            dbc.Input(id={'type': 'rate-constant-input', 'index': 0}, type='number', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'})
+            dbc.Input(id={'type': 'rate-constant-input', 'index': 0}, type='number', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'}),
+            dbc.InputGroupText("±"),
+            dbc.Input(id={'type': 'rate-uncertainty-input', 'index': 0}, type='number', min=0, max=99, placeholder='%', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'})
         ], style={'display': 'flex', 'align-items': 'center', 'margin-bottom': '10px'})
     ], style={'margin-bottom': '10px'}),
     html.Div([
@@ -173,7 +165,8 @@ layout = html.Div([
     html.Div(
         dcc.Graph(id='kinetics-graph', style={'display': 'none', 'width': '500px', 'height': '500px'}),
         style={'display': 'flex', 'justify-content': 'center'}  # Center the graph
-    )
+    ),
+    html.Div(id='kinetics-solver-info', style={'text-align': 'center', 'margin-top': '10px'})
 ], style={'margin-left': '10px', 'margin-top': '10px'})
 
 # Callbacks to handle input and generate the graph
@@ -197,7 +190,9 @@ def update_reaction_inputs(add_clicks, remove_clicks, reaction_inputs):
             dbc.InputGroupText("Elementary Reaction:", style={'margin-left': '2px'}),
             dbc.Input(id={'type': 'reaction-input', 'index': add_clicks}, placeholder='e.g., 2H2 + O2 -> 2H2O', type='text', style={'margin-right': '10px', 'margin-left': '10px', 'width': '500px'}),
             dbc.InputGroupText("Rate Constant:"),
-            dbc.Input(id={'type': 'rate-constant-input', 'index': add_clicks}, type='number', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'})
+            dbc.Input(id={'type': 'rate-constant-input', 'index': add_clicks}, type='number', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'}),
+            dbc.InputGroupText("±"),
+            dbc.Input(id={'type': 'rate-uncertainty-input', 'index': add_clicks}, type='number', min=0, max=99, placeholder='%', style={'margin-right': '10px', 'margin-left': '10px', 'width': '50px'})
         ], style={'display': 'flex', 'align-items': 'center', 'margin-bottom': '5px'})
         reaction_inputs.append(new_reaction_input)
 
@@ -260,12 +255,14 @@ def detect_species_and_input_concentrations(n_clicks, reactions, rate_constants)
 @callback(
     Output('kinetics-graph', 'figure'),
     Output('kinetics-graph', 'style'),  # Add output for graph style
+    Output('kinetics-solver-info', 'children'),
     Input('submit-button', 'n_clicks'),
     State({'type': 'reaction-input', 'index': dash.ALL}, 'value'),
     State({'type': 'rate-constant-input', 'index': dash.ALL}, 'value'),
-    State({'type': 'concentration-input', 'index': dash.ALL}, 'value')
+    State({'type': 'concentration-input', 'index': dash.ALL}, 'value'),
+    State({'type': 'rate-uncertainty-input', 'index': dash.ALL}, 'value')
 )
-def generate_graph(n_clicks, reactions, rate_constants, concentrations):
+def generate_graph(n_clicks, reactions, rate_constants, concentrations, uncertainties):
     # Check if all reactions, rate constants, and concentrations are not None
     if n_clicks > 0 and all(reactions) and all(rate_constants) and all(c is not None for c in concentrations):
         ks = list(map(float, rate_constants))
@@ -276,6 +273,9 @@ def generate_graph(n_clicks, reactions, rate_constants, concentrations):
         # Strip out HTML tags from species names
         C0 = {re.sub(r'<.*?>', '', key): value for key, value in C0.items()}
         
-        fig = reactiongraphing(reactions, ks, C0)
-        return fig, {'display': 'block'}  # Show the graph
-    return go.Figure(), {'display': 'none'}  # Hide the graph if conditions are not met
\ No newline at end of file
+        # Optional +-% ranges on the rate constants, blank meaning exact
+        uncertainties = [float(u) if u else 0.0 for u in uncertainties]
+
+        fig, info = reactiongraphing(reactions, ks, C0, uncertainties)
+        return fig, {'display': 'block'}, info  # Show the graph
+    return go.Figure(), {'display': 'none'}, ''  # Hide the graph if conditions are not met
\ No newline at end of file
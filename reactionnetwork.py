@@ -0,0 +1,292 @@
+# Mass-action reaction networks compiled once into matrices for the Kinetics page
+# Reactions are strings like '2H2 + O2 -> 2H2O' (a coefficient may also be written 2*H2). Parsing happens once,
+# giving a reactant matrix (also the reaction orders, the reactions being elementary) and a product matrix, so
+# every right-hand side evaluation is r = k*prod(C**orders) and dC/dt = S @ r, with no string work in the solver.
+# The same matrices give the exact mass-action Jacobian, which integrate() uses to pick and feed a stiff solver,
+# and both extend to an ensemble of rate-constant sets integrated as one stacked system (ensemble_percentiles).
+import re
+import numpy as np
+from scipy.integrate import OdeSolution, RK45, BDF, Radau, LSODA
+from scipy.optimize import brentq
+from scipy.sparse import csc_matrix
+
+_coefficient = re.compile(r'^(\d*)\*?')
+
+def parse_side(side):
+    # {species: coefficient}, in order of appearance; a species listed twice (A + A) adds up like 2A
+    terms = {}
+    for term in side.split('+'):
+        term = term.strip()
+        match = _coefficient.match(term)
+        coefficient, species = match.group(1), term[match.end():].strip()
+        if not species:
+            raise ValueError(f"Could not read a species from '{term}'.")
+        terms[species] = terms.get(species, 0) + (int(coefficient) if coefficient else 1)
+    return terms
+
+def parse_reaction(reaction):
+    if reaction.count('->') != 1:
+        raise ValueError(f"Reaction '{reaction}' needs exactly one '->'.")
+    reactants, products = reaction.split('->')
+    return parse_side(reactants), parse_side(products)
+
+class ReactionNetwork:
+    def __init__(self, species, reactants, products):
+        # reactants and products are (reactions, species) coefficient matrices
+        self.species = list(species)
+        self.reactants = np.asarray(reactants, dtype=float)
+        self.products = np.asarray(products, dtype=float)
+        self.orders = self.reactants
+        self.stoichiometry = (self.products - self.reactants).T # (species, reactions)
+        # The product over each reaction's reactants as one gather and one reduceat: every species index repeated
+        # by its (integer) order, with the offset where each reaction's factors start. Twice as fast as
+        # prod(C**orders) on the small networks the page sees, and every reaction has at least one reactant.
+        counts = self.orders.astype(int)
+        self._factors = np.concatenate([np.repeat(np.arange(len(self.species)), row) for row in counts])
+        self._starts = np.concatenate(([0], np.cumsum(counts.sum(axis=1))[:-1]))
+        # d rate_j/d C_i = k_j*n_ji*C_i**(n_ji - 1)*prod(other factors): the same gather with one C_i taken out,
+        # for every (j, i) with n_ji > 0; index len(species) is a constant 1 so a first order term is not empty
+        self._pairs = np.nonzero(counts)
+        pair_factors = []
+        for j, i in zip(*self._pairs):
+            factors = list(np.repeat(np.arange(len(self.species)), counts[j]))
+            factors.remove(i)
+            pair_factors.append([len(self.species)] + factors)
+        self._pair_factors = np.concatenate(pair_factors) if pair_factors else np.zeros(0, dtype=int)
+        self._pair_starts = np.concatenate(([0], np.cumsum([len(factors) for factors in pair_factors])[:-1]))
+
+    @classmethod
+    def from_reactions(cls, reactions):
+        parsed = [parse_reaction(reaction) for reaction in reactions]
+        species = []
+        for reactants, products in parsed:
+            for name in list(reactants) + list(products):
+                if name not in species:
+                    species.append(name)
+        index = {name: i for i, name in enumerate(species)}
+        left, right = np.zeros((len(parsed), len(species))), np.zeros((len(parsed), len(species)))
+        for i, (reactants, products) in enumerate(parsed):
+            for name, coefficient in reactants.items():
+                left[i, index[name]] = coefficient
+            for name, coefficient in products.items():
+                right[i, index[name]] = coefficient
+        return cls(species, left, right)
+
+    def rates(self, C, k):
+        # k*prod(C**orders) for every reaction
+        return np.asarray(k, dtype=float)*np.multiply.reduceat(np.asarray(C, dtype=float)[self._factors], self._starts)
+
+    def rhs(self, k):
+        # f(t, C) = S @ rates for solve_ivp, with the matrices and k bound once
+        k = np.asarray(k, dtype=float)
+        S, factors, starts = self.stoichiometry, self._factors, self._starts
+        def f(t, C):
+            return S @ (k*np.multiply.reduceat(C[factors], starts))
+        return f
+
+    def jacobian(self, k):
+        # jac(t, C) = S @ d rates/d C, exact for mass action
+        k = np.asarray(k, dtype=float)
+        S, (rows, cols), factors, starts = self.stoichiometry, self._pairs, self._pair_factors, self._pair_starts
+        scale = k[rows]*self.orders[rows, cols]
+        shape = (len(k), len(self.species))
+        def jac(t, C):
+            drdC = np.zeros(shape)
+            drdC[rows, cols] = scale*np.multiply.reduceat(np.append(C, 1.0)[factors], starts)
+            return S @ drdC
+        return jac
+
+    # Ensembles: K is (samples, reactions), one rate-constant set per row, and the stacked state is the
+    # (species, samples) concentration array flattened, so the gathers above work along the first axis unchanged
+
+    def ensemble_rhs(self, K):
+        KT = np.asarray(K, dtype=float).T
+        S, factors, starts, shape = self.stoichiometry, self._factors, self._starts, (len(self.species), len(KT[0]))
+        def f(t, y):
+            return (S @ (KT*np.multiply.reduceat(y.reshape(shape)[factors], starts, axis=0))).ravel()
+        return f
+
+    def jacobian_blocks(self, K, C):
+        # (samples, species, species) Jacobians for C of shape (species, samples)
+        K, C = np.asarray(K, dtype=float), np.asarray(C, dtype=float)
+        rows, cols = self._pairs
+        extended = np.vstack((C, np.ones(C.shape[1])))
+        values = (K.T[rows]*self.orders[rows, cols][:, None]
+                  *np.multiply.reduceat(extended[self._pair_factors], self._pair_starts, axis=0))
+        drdC = np.zeros((len(K), len(self.orders), len(self.species)))
+        drdC[:, rows, cols] = values.T
+        return self.stoichiometry @ drdC
+
+    def ensemble_jacobian(self, K):
+        # block diagonal, so sparse: BDF then factorizes it with splu instead of a dense LU of the whole stack
+        samples, n = len(K), len(self.species)
+        a, b = np.nonzero((self.stoichiometry != 0).astype(int) @ (self.orders > 0).astype(int))
+        offsets = np.arange(samples)[:, None]
+        rows, cols = (a*samples + offsets).ravel(), (b*samples + offsets).ravel()
+        def jac(t, y):
+            blocks = self.jacobian_blocks(K, y.reshape(n, samples))
+            return csc_matrix((blocks[:, a, b].ravel(), (rows, cols)), shape=(n*samples, n*samples))
+        return jac
+
+solvers = {'RK45': RK45, 'BDF': BDF, 'Radau': Radau, 'LSODA': LSODA}
+explicit = {'RK45'}
+
+def stiffness(J, duration):
+    # Steps an explicit method needs for stability alone, roughly duration*max|Re(lambda)| (up to RK45's ~3),
+    # from the Jacobian eigenvalues; large means the fastest mode is far quicker than the time span. J may
+    # also be a stack of Jacobians, one per ensemble member.
+    eigenvalues = np.linalg.eigvals(J)
+    decaying = -eigenvalues.real[eigenvalues.real < 0]
+    return float(duration*decaying.max()) if decaying.size else 0.0
+
+def distance_to_steady_state(J, dCdt):
+    # Largest concentration change of one Newton step towards dC/dt = 0, i.e. how far the state still has to
+    # move rather than how fast it moves now, so a slow reaction on a plateau is not mistaken for steady state.
+    # Least squares because conservation laws make J singular.
+    return float(np.max(np.abs(np.linalg.lstsq(J, dCdt, rcond=None)[0])))
+
+def time_scale(network, k, C0, slowest = False):
+    # 1/(fastest decay rate) at C0, or 1/(slowest nonzero one) with slowest=True; None when nothing decays yet
+    eigenvalues = np.linalg.eigvals(network.jacobian(k)(0.0, np.asarray(C0, dtype=float)))
+    decaying = -eigenvalues.real[eigenvalues.real < 0]
+    if not decaying.size:
+        return None
+    return 1/(decaying.min() if slowest else decaying.max())
+
+def integrate(network, k, C0, t_span, t_eval = None, method = 'auto', stiff_threshold = 500, max_explicit_steps = 2000,
+              steady_tol = None, growth = None, max_time = None, max_steps = None, max_growth = None, rtol = 1e-3,
+              atol = 1e-6):
+    # solve_ivp-like integration of a compiled network with automatic stiff-solver selection. method='auto'
+    # starts with BDF when the Jacobian at C0 is already stiff over t_span, otherwise with RK45, and hands over
+    # to BDF from the current state when RK45's recent step size projects more than max_explicit_steps
+    # (step-size collapse, e.g. a fast reaction equilibrating next to a slow one). Any key of solvers may be
+    # given instead of 'auto'. With steady_tol set, a terminal event stops the integration once the distance to
+    # steady state drops below steady_tol times the largest concentration seen (a crossing, located with brentq
+    # on the step's dense output, so a start at an unstable steady state like A + B -> 2B with no B is not one).
+    # A start already within the tolerance that stays there is reported as steady at the end of t_span, which
+    # keeps the window at the scale t_span was chosen for.
+    # With growth and max_time set, reaching the end of t_span without a steady state extends it geometrically
+    # (the end moves to t0 + growth*(end - t0), capped at max_time) and the same method carries on from the
+    # current state; max_steps caps the total number of steps. With max_growth set, the run stops as diverged
+    # (nothing more is extended) at the first step where a concentration is non-finite or exceeds max_growth
+    # times the largest initial one, and the result keeps the trajectory up to the last finite step.
+    # Returns a dict with t, y, sol (dense output over everything integrated), steady_state (event time or
+    # None), diverged and the stats.
+    # A 2-D k is an ensemble (see ReactionNetwork.ensemble_rhs): C0 is shared by every set and y comes back
+    # as (species*samples, times), and the stiffness check looks at the stiffest set.
+    k, C0 = np.asarray(k, dtype=float), np.asarray(C0, dtype=float)
+    t0, t1 = t_span
+    if k.ndim == 2:
+        f, jac = network.ensemble_rhs(k), network.ensemble_jacobian(k)
+        blocks = network.jacobian_blocks(k, np.repeat(C0[:, None], len(k), axis=1))
+        C0 = np.repeat(C0, len(k))
+    else:
+        f, jac = network.rhs(k), network.jacobian(k)
+        blocks = jac(t0, C0)
+    auto = method == 'auto'
+    ratio = stiffness(blocks, t1 - t0)
+    if auto:
+        method = 'BDF' if ratio > stiff_threshold else 'RK45'
+    methods, stats = [method], {'steps': 0, 'nfev': 0, 'njev': 0, 'nlu': 0}
+
+    def start(method, t, y):
+        options = {} if method in explicit else {'jac': jac}
+        return solvers[method](f, t, y, t1, rtol=rtol, atol=atol, **options)
+
+    def collect(solver):
+        for key in ('nfev', 'njev', 'nlu'):
+            stats[key] += getattr(solver, key, 0)
+
+    def steady(t, y):
+        return distance_to_steady_state(jac(t, y), f(t, y)) - steady_tol*scale
+
+    if steady_tol is not None and not np.any(f(t0, C0)):
+        # nothing reacts at all (e.g. a reactant is absent), which the crossing rule would never report
+        return {'t': np.array([t0, t1]), 'y': np.repeat(C0[:, None], 2, axis=1), 'sol': None, 'success': True,
+                'message': 'Nothing reacts at C0.', 'steady_state': t0, 'diverged': False, 'method': method,
+                'stiffness': ratio, **stats}
+
+    solver = start(method, t0, C0)
+    ts, ys, interpolants = [t0], [C0], []
+    check_t, status, message = t0, 'running', 'The solver successfully reached the end of the integration interval.'
+    steady_state, scale = None, np.max(np.abs(C0))
+    bound = max_growth*scale if max_growth is not None else np.inf
+    event = steady(t0, C0) if steady_tol is not None else None
+    settled = event is not None and event <= 0 # within the tolerance since t0
+    while solver.status == 'running':
+        step_message = solver.step()
+        if solver.status == 'failed':
+            status, message = 'failed', step_message
+            break
+        stats['steps'] += 1
+        if not np.all(np.isfinite(solver.y)):
+            status, message = 'diverged', 'Concentrations diverged.'
+            break
+        ts.append(solver.t)
+        ys.append(solver.y)
+        interpolants.append(solver.dense_output())
+        if np.max(np.abs(solver.y)) > bound:
+            status, message = 'diverged', 'Concentrations diverged.'
+            break
+        if steady_tol is not None:
+            scale = max(scale, np.max(np.abs(solver.y)))
+            previous, event = event, steady(solver.t, solver.y)
+            settled = settled and event <= 0
+            if settled and solver.status == 'finished':
+                steady_state, status, message = solver.t, 'steady', 'Steady state reached.'
+                break
+            if previous > 0 >= event:
+                interpolant = interpolants[-1]
+                steady_state = brentq(lambda t: steady(t, interpolant(t)), ts[-2], ts[-1], xtol=1e-12*abs(ts[-1]))
+                ts[-1], ys[-1] = steady_state, interpolant(steady_state)
+                status, message = 'steady', 'Steady state reached.'
+                break
+        if max_steps is not None and stats['steps'] >= max_steps:
+            status, message = 'budget', f'Stopped after {max_steps} steps.'
+            break
+        if solver.status == 'finished' and growth is not None and max_time is not None and t1 < max_time:
+            collect(solver)
+            t1 = min(t0 + growth*(t1 - t0), max_time)
+            solver = start(methods[-1], solver.t, solver.y)
+        if auto and methods[-1] in explicit and stats['steps'] % 50 == 0 and solver.status == 'running':
+            mean_step = (solver.t - check_t)/50
+            check_t = solver.t
+            if stats['steps'] + (t1 - solver.t)/mean_step > max_explicit_steps:
+                collect(solver)
+                methods.append('BDF')
+                solver = start('BDF', solver.t, solver.y)
+    collect(solver)
+
+    ts, ys = np.array(ts), np.array(ys).T
+    sol = OdeSolution(ts, interpolants) if interpolants else None
+    if t_eval is not None:
+        t_eval = np.asarray(t_eval, dtype=float)
+        t_eval = t_eval[t_eval <= ts[-1]]
+        ts, ys = t_eval, sol(t_eval) if sol is not None else np.repeat(C0[:, None], len(t_eval), axis=1)
+    return {'t': ts, 'y': ys, 'sol': sol, 'success': status != 'failed', 'message': message,
+            'steady_state': steady_state, 'diverged': status == 'diverged', 'method': ' -> '.join(methods),
+            'stiffness': ratio, **stats}
+
+def sample(solution, points = 400, refine = 8):
+    # Output times spread evenly along the arc length of the curves, with time and each species scaled to its
+    # range, so fast transients get many points and flat stretches few. Candidates are the solver's own steps
+    # (already short where things change quickly) each cut into refine pieces; solution must come from
+    # integrate without t_eval.
+    sol, ts = solution['sol'], solution['t']
+    if sol is None:
+        return ts, solution['y']
+    candidates = np.append((ts[:-1, None] + np.diff(ts)[:, None]*np.arange(refine)/refine).ravel(), ts[-1])
+    y = sol(candidates)
+    span = np.ptp(y, axis=1)
+    span[span == 0] = 1.0
+    change = np.max(np.abs(np.diff(y, axis=1))/span[:, None], axis=0)
+    length = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(candidates)/(ts[-1] - ts[0]), change))))
+    t = np.interp(np.linspace(0.0, length[-1], points), length, candidates)
+    return t, sol(t)
+
+def ensemble_percentiles(network, K, C0, t, percentiles = (5, 50, 95), **options):
+    # Integrates every rate-constant set in K (samples, reactions) at once over the output times t and returns
+    # the (len(percentiles), species, times) concentration percentiles across the sets, plus the solution
+    solution = integrate(network, K, C0, (t[0], t[-1]), t_eval=t, **options)
+    y = solution['y'].reshape(len(network.species), len(K), -1)
+    return np.percentile(y, percentiles, axis=1), solution
@@ -0,0 +1,111 @@
+# On-disk cache for VLE curves (xy, Txy, Pxy arrays)
+# The curves are deterministic for a given pair, condition, grid and model, so they are stored as compressed
+# .npz files named by a hash of those inputs. Every worker process on the box shares the same directory.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+default_dir = os.environ.get('VLE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.vlecache'))
+default_max_bytes = int(os.environ.get('VLE_CACHE_MAX_BYTES', 64*1024*1024)) # 64 MB, a 100 point curve is ~3 kB
+
+def cache_key(kind, comp1, comp2, T = None, P = None, pts = 100, model = 'UNIFAC', salt = ''):
+    # salt lets callers fold in anything else the result depends on, e.g. the thermo version
+    payload = {'kind': kind, 'comp1': comp1.strip().lower(), 'comp2': comp2.strip().lower(),
+               'T': None if T is None else float(T), 'P': None if P is None else float(P),
+               'pts': pts, 'model': model, 'salt': salt}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class VLECache:
+    def __init__(self, directory = default_dir, max_bytes = default_max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path) # mtime doubles as the last-used time for LRU eviction
+        except (OSError, ValueError):
+            # missing, or half-written/corrupt from a killed worker; it gets recomputed and overwritten
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return arrays
+
+    def store(self, key, **arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temp file and rename so other processes never read a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.npz')]
+        except OSError:
+            return
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError: # removed by another process in the meantime
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files): # oldest first
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+
+    def get_or_compute(self, key, compute):
+        # compute() returns a dict of arrays; failures to write the cache never fail the caller
+        arrays = self.load(key)
+        if arrays is not None:
+            return arrays
+        arrays = {name: np.asarray(values, dtype=float) for name, values in compute().items()}
+        try:
+            self.store(key, **arrays)
+        except OSError:
+            pass
+        return arrays
+
+    def stats(self):
+        with self._lock:
+            return {'directory': self.directory, 'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def clear(self):
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.npz'):
+                    os.remove(entry.path)
+        except OSError:
+            pass
+
+vle_cache = VLECache()
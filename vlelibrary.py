@@ -0,0 +1,130 @@
+# Prebuilt VLE library: xy/Txy/Pxy tables for common binary pairs packed into one memory-mapped file
+# Build it once (the Dockerfile does this at image build time):
+#   python vlelibrary.py                              # default pairs and conditions below
+#   python vlelibrary.py --config pairs.json -j 4     # custom list, 4 worker processes
+# The data is a flat float64 .npy next to a .json index, entries are keyed exactly like the disk cache
+# (vlecache.cache_key) so TxyPxyxy.cached_curve can look them up before computing anything.
+import argparse
+import json
+import os
+import threading
+import numpy as np
+
+default_path = os.environ.get('VLE_LIBRARY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vle_library'))
+
+default_config = {
+    'pairs': [
+        ['methanol', 'water'], ['ethanol', 'water'], ['1-propanol', 'water'], ['isopropanol', 'water'],
+        ['acetone', 'water'], ['acetic acid', 'water'], ['acetone', 'methanol'], ['acetone', 'chloroform'],
+        ['methanol', 'ethanol'], ['ethanol', 'benzene'], ['benzene', 'toluene'], ['toluene', 'p-xylene'],
+        ['hexane', 'heptane'], ['pentane', 'hexane'], ['cyclohexane', 'benzene'], ['ethyl acetate', 'ethanol'],
+    ],
+    'xy': {'T': [298.15, 300, 325, 350], 'P': [1, 1.01325]}, # K, bar
+    'Txy': {'P': [1, 1.01325]}, # bar
+    'Pxy': {'T': [298.15, 300]}, # K
+    'pts': 100,
+    'model': 'UNIFAC',
+}
+
+class VLELibrary:
+    # Read side, nothing is opened until the first lookup and the arrays are views into the memory map
+    def __init__(self, path = default_path):
+        self.path = path
+        self._index = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._index is None:
+                try:
+                    with open(self.path + '.json') as f:
+                        index = json.load(f)
+                    self._data = np.load(self.path + '.npy', mmap_mode='r')
+                except (OSError, ValueError): # no library built, every lookup misses
+                    index = {}
+                self._index = index
+        return self._index
+
+    def get(self, key):
+        entry = self._load().get(key)
+        if entry is None:
+            return None
+        offset, length = entry['offset'], entry['length']
+        return {name: self._data[offset + i*length:offset + (i + 1)*length] for i, name in enumerate(entry['fields'])}
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __len__(self):
+        return len(self._load())
+
+vle_library = VLELibrary()
+
+def _library_pair_worker(comp1, comp2, config):
+    # Computes every requested curve for one pair; runs in a pool process when building with -j
+    from TxyPxyxy import cached_curve
+    from vlecache import cache_key
+    import thermo
+    jobs = ([('xy', T, None) for T in config.get('xy', {}).get('T', [])]
+            + [('xy', None, P*1e5) for P in config.get('xy', {}).get('P', [])]
+            + [('Txy', None, P*1e5) for P in config.get('Txy', {}).get('P', [])]
+            + [('Pxy', T, None) for T in config.get('Pxy', {}).get('T', [])])
+    entries, errors = [], []
+    for kind, T, P in jobs:
+        try:
+            curve = cached_curve(kind, comp1, comp2, T=T, P=P, pts=config['pts'], model=config['model'])
+        except Exception as e:
+            errors.append(f'{comp1}/{comp2} {kind} T={T} P={P}: {type(e).__name__}: {e}')
+            continue
+        key = cache_key(kind, comp1, comp2, T=T, P=P, pts=config['pts'], model=config['model'], salt=thermo.__version__)
+        arrays = {name: np.asarray(values, dtype=float) for name, values in curve.items()}
+        # only the per-point columns are packed, scalars such as solver iteration counts are dropped
+        entries.append((key, {'kind': kind, 'comp1': comp1, 'comp2': comp2, 'T': T, 'P': P},
+                        {name: values for name, values in arrays.items() if values.ndim == 1}))
+    return entries, errors
+
+def build_library(config, path = default_path, workers = 1):
+    tasks = [(comp1, comp2, config) for comp1, comp2 in config['pairs']]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_library_pair_worker, *zip(*tasks)))
+    else:
+        results = [_library_pair_worker(*task) for task in tasks]
+
+    index, chunks, offset = {}, [], 0
+    for entries, errors in results:
+        for error in errors:
+            print('skipped', error)
+        for key, meta, arrays in entries:
+            fields = list(arrays)
+            length = len(arrays[fields[0]])
+            chunks.extend(arrays[name] for name in fields)
+            index[key] = dict(meta, fields=fields, offset=offset, length=length)
+            offset += length*len(fields)
+    data = np.concatenate(chunks) if chunks else np.zeros(0)
+    # write both files under temp names first so a running app never sees a mismatched pair
+    np.save(path + '.tmp.npy', data)
+    with open(path + '.tmp.json', 'w') as f:
+        json.dump(index, f)
+    os.replace(path + '.tmp.npy', path + '.npy')
+    os.replace(path + '.tmp.json', path + '.json')
+    return len(index), data.nbytes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute xy/Txy/Pxy tables for common binary pairs')
+    parser.add_argument('--config', help='JSON file with pairs and conditions, same layout as default_config')
+    parser.add_argument('--out', default=default_path, help='output path without extension (.npy and .json are written)')
+    parser.add_argument('--pts', type=int, help='composition grid points per curve')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='worker processes')
+    args = parser.parse_args()
+
+    config = dict(default_config)
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+    if args.pts:
+        config['pts'] = args.pts
+    n_entries, n_bytes = build_library(config, path=args.out, workers=args.workers)
+    print(f'wrote {n_entries} curves ({n_bytes/1024:.0f} kB) to {args.out}.npy')